@@ -1,14 +1,93 @@
-import requests
+import threading
+import time
 import logging
 
 from django.conf import settings
 from jose import jwt
-from bank_admin.supabase_client import supabase
 from rest_framework.permissions import BasePermission
 
+from utilities.http_client import get_http_client
+
 logger = logging.getLogger(__name__)
 JWKS_URL = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
-jwks = requests.get(JWKS_URL).json()
+# Signing algorithm of a JWKS key that does not name one, by (kty, crv)
+KEY_TYPE_ALGORITHMS = {
+    ('EC', 'P-256'): 'ES256',
+    ('RSA', None): 'RS256',
+}
+
+
+class JWKSKeyStore:
+    """
+    Supabase signing keys indexed by kid
+    Loaded on first use (never at import), refreshed by a daemon thread every TTL and refetched on an unknown kid
+    """
+
+    def __init__(self, url, ttl, min_refetch_interval, timeout):
+        self.url = url
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def fetch(self):
+        response = get_http_client('supabase').get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return {key['kid']: key for key in response.json().get('keys', []) if key.get('kid')}
+
+    def refresh(self, min_age=None):
+        """
+        Reload the key set, keeping the previous keys if Supabase is unreachable
+        With min_age, skip it if the keys were fetched more recently than that, checked under the lock so
+        concurrent callers that all saw a miss fetch once
+        """
+        with self._lock:
+            if min_age is not None and self._fetched_at is not None and \
+                    time.monotonic() - self._fetched_at <= min_age:
+                return
+            try:
+                self._keys = self.fetch()
+            except Exception as ex:
+                logger.warning(f"Supabase JWKS refresh failed: {ex}")
+            finally:
+                self._fetched_at = time.monotonic()
+
+    def get_key(self, kid):
+        if self._fetched_at is None:
+            self.refresh(min_age=self.min_refetch_interval)
+        self.start_background_refresh()
+
+        key = self._keys.get(kid)
+        if key is None:
+            # Keys may have been rotated since the last refresh
+            self.refresh(min_age=self.min_refetch_interval)
+            key = self._keys.get(kid)
+        return key
+
+    def start_background_refresh(self):
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_forever, name='supabase-jwks-refresh',
+                                                   daemon=True)
+                self._refresher.start()
+
+    def _refresh_forever(self):
+        while True:
+            time.sleep(self.ttl)
+            self.refresh()
+
+
+jwks_key_store = JWKSKeyStore(
+    url=JWKS_URL,
+    ttl=settings.SUPABASE_JWKS_TTL,
+    min_refetch_interval=settings.SUPABASE_JWKS_MIN_REFETCH_INTERVAL,
+    timeout=settings.SUPABASE_JWKS_TIMEOUT,
+)
 
 
 class IsSupabaseAuthenticated(BasePermission):
@@ -18,32 +97,29 @@ class IsSupabaseAuthenticated(BasePermission):
             return False
 
         token = auth_header.split(" ")[1]
-        try:
-            # Verify signature using JWKS
-            header = jwt.get_unverified_header(token)
-            key = next((k for k in jwks["keys"] if k["kid"] == header["kid"]), None)
-            if key is None:
-                return False
-
-            jwt.decode(
-                token,
-                key,
-                algorithms=[header["alg"]],
-                options={"verify_aud": False}  # adjust as needed
-            )
-            return True
-        except Exception:
-            return False
+        return verify_supabase_jwt(token) is not None
+
+
+def get_key_algorithm(key):
+    """The key's own algorithm, or the one its type implies, None unless it is in SUPABASE_JWT_ALGORITHMS"""
+    algorithm = key.get("alg") or KEY_TYPE_ALGORITHMS.get((key.get("kty"), key.get("crv")))
+    return algorithm if algorithm in settings.SUPABASE_JWT_ALGORITHMS else None
 
 
 def verify_supabase_jwt(token: str):
+    """Verify a Supabase token locally against the cached JWKS, no per-token network call"""
     try:
-        header = supabase.auth.get_claims(jwt=token)
-        key = next((k for k in jwks["keys"] if k["kid"] == header["kid"]), None)
+        header = jwt.get_unverified_header(token)
+        key = jwks_key_store.get_key(header.get("kid"))
         if not key:
             return None
 
-        decoded = jwt.decode(token, key, algorithms=[header["alg"]], options={"verify_aud": False})
+        # The algorithm comes from the key and the allow-list, never from the token header
+        algorithm = get_key_algorithm(key)
+        if algorithm is None or header.get("alg") != algorithm:
+            logger.warning(f"Supabase JWT signed with {header.get('alg')}, expected {algorithm}")
+            return None
+        decoded = jwt.decode(token, key, algorithms=[algorithm], options={"verify_aud": False})
         return decoded
     except Exception as ex:
         logger.warning(f"Supabase JWT token validation error: {ex}")
@@ -1,3 +1,24 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from jose import jwt
+
+from bank_admin.permissions import get_key_algorithm, verify_supabase_jwt
+
+
+class SupabaseJwtAlgorithmTests(SimpleTestCase):
+
+    def test_algorithm_comes_from_the_key(self):
+        self.assertEqual(get_key_algorithm({'kty': 'EC', 'crv': 'P-256', 'alg': 'ES256'}), 'ES256')
+        self.assertEqual(get_key_algorithm({'kty': 'EC', 'crv': 'P-256'}), 'ES256')
+        self.assertEqual(get_key_algorithm({'kty': 'RSA'}), 'RS256')
+
+    def test_algorithms_off_the_allow_list_are_refused(self):
+        self.assertIsNone(get_key_algorithm({'kty': 'oct', 'alg': 'HS256'}))
+        self.assertIsNone(get_key_algorithm({'kty': 'oct'}))
+
+    def test_token_header_cannot_pick_the_algorithm(self):
+        token = jwt.encode({'sub': 'admin'}, 'secret', algorithm='HS256', headers={'kid': 'k1'})
+        key = {'kid': 'k1', 'kty': 'oct', 'k': 'c2VjcmV0'}
+        with mock.patch('bank_admin.permissions.jwks_key_store.get_key', return_value=key):
+            self.assertIsNone(verify_supabase_jwt(token))
@@ -1,4 +1,3 @@
-import requests
 from django.conf import settings
 from django.utils import timezone
 
@@ -12,6 +11,7 @@ from bank_admin.supabase_client import supabase
 from bank_admin.permissions import IsSupabaseAuthenticated
 from student_admin.serializers import BdBankSerializer
 from student_portal.permissions import IsAnyAdmin, IsBankAdmin
+from utilities.http_client import get_http_client
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -101,7 +101,7 @@ class AuthViewSet(viewsets.ViewSet):
         headers = {"apikey": settings.SUPABASE_SERVICE_ROLE_KEY, "Content-Type": "application/json"}
         data = {"refresh_token": refresh_token}
 
-        res = requests.post(url, headers=headers, json=data)
+        res = get_http_client('supabase').post(url, headers=headers, json=data)
         return Response(res.json(), status=res.status_code)
 
     @action(detail=False, methods=["post"])
@@ -114,7 +114,7 @@ class AuthViewSet(viewsets.ViewSet):
         url = f"{settings.SUPABASE_URL}/auth/v1/logout"
         headers = {"apikey": settings.SUPABASE_SERVICE_ROLE_KEY, "Authorization": f"Bearer {access_token}"}
 
-        res = requests.post(url, headers=headers)
+        res = get_http_client('supabase').post(url, headers=headers)
         if res.status_code == 204:
             return Response({"message": "Logged out successfully"})
         return Response(res.json(), status=res.status_code)
@@ -2,6 +2,7 @@ import logging
 import jwt
 import uuid
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 from django.http import JsonResponse
 from error_handling.custom_exception import CustomErrorWithCode
@@ -11,8 +12,14 @@ from students.models import ServiceKey
 
 
 class AuthMiddleware(object):
+    # Async-capable so an ASGI request reaches async views (students.views.async_proxy_view) without holding a thread
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     @staticmethod
     def is_swagger_path(path):
@@ -61,7 +68,8 @@ class AuthMiddleware(object):
         else:
             return None
 
-    def __call__(self, request):
+    def check_request(self, request):
+        """Tag the request with its id, token and calling service, returns the error response if it is refused"""
         request.request_id = str(uuid.uuid4())
         request.auth_token = self.get_jwt_raw_token_from_request(request)
 
@@ -70,10 +78,24 @@ class AuthMiddleware(object):
         request.service = service
 
         if bool(settings.IS_SWAGGER_ENABLED) and self.is_swagger_path(request.path):
-            return self.get_response(request)
+            return None
 
         if request.service not in ServiceList.get_student_service_list():
             permission_error = CustomErrorWithCode(code=403, message='You are not permitted to access this API')
             return self.get_json_response_with_error(permission_error, 403)
+        return None
 
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        error_response = self.check_request(request)
+        if error_response is not None:
+            return error_response
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        # The service key lookup may touch the cache and the database
+        error_response = await sync_to_async(self.check_request)(request)
+        if error_response is not None:
+            return error_response
+        return await self.get_response(request)
@@ -1,12 +1,24 @@
+import copy
 import logging
 import jwt
+from functools import lru_cache
 
 from django.utils import timezone
 from rest_framework import authentication, exceptions
 from api_clients.auth_client import auth_client
 from students.models import CustomUser, StudentUser
+from student_portal.principal_cache import principal_cache
+from utilities.http_client import attach_http_client
+from utilities.single_flight import SingleFlight
 
 log = logging.getLogger(__name__)
+student_provisioning = SingleFlight()
+
+
+@lru_cache(maxsize=None)
+def get_auth_client():
+    """The auth service client, routed through the pooled session on first use rather than at import"""
+    return attach_http_client(auth_client, 'auth')
 
 
 class JWTAuth(authentication.BaseAuthentication):
@@ -16,9 +28,9 @@ class JWTAuth(authentication.BaseAuthentication):
     """
 
     @staticmethod
-    def retrieve_jwt_token_from_request(request):
+    def retrieve_raw_jwt_token_from_request(request):
         """
-        Extract JWT token from request header
+        Extract the raw (undecoded) JWT token from request header
         """
         PREFIX = 'Bearer '
         auth_header = request.META.get('HTTP_AUTHORIZATION')
@@ -29,7 +41,14 @@ class JWTAuth(authentication.BaseAuthentication):
         if not auth_header.startswith(PREFIX):
             raise exceptions.AuthenticationFailed('Bearer prefix missing in authorization header')
 
-        auth_token = auth_header[len(PREFIX):]
+        return auth_header[len(PREFIX):]
+
+    @classmethod
+    def retrieve_jwt_token_from_request(cls, request):
+        """
+        Extract JWT token from request header
+        """
+        auth_token = cls.retrieve_raw_jwt_token_from_request(request)
         try:
             decoded_token = jwt.decode(auth_token, options={"verify_signature": False})
             return auth_token, decoded_token
@@ -82,29 +101,49 @@ class JWTAuth(authentication.BaseAuthentication):
             raise exceptions.AuthenticationFailed('Invalid student token payload - missing uuid')
 
         # Try to find existing user by one_auth_uuid
-        try:
-            user = StudentUser.objects.get(one_auth_uuid=auth_uuid)
+        user = StudentUser.objects.filter(one_auth_uuid=auth_uuid).first()
+        if user:
             log.info(f"Found existing student user: {user.id}")
             return user
-        except StudentUser.DoesNotExist:
-            log.info(f"Creating new student user for UUID: {auth_uuid}")
 
-            # Fetch user details from auth service
-            profile_data = auth_client.get_user_profile(jwt_token)
+        # Concurrent first requests from the same student share one auth service call and one insert
+        user = student_provisioning.do(
+            str(auth_uuid), JWTAuth.provision_student_from_auth_service, auth_uuid, student_id, jwt_token
+        )
+        # Waiters get the leader's instance, so hand each request its own copy
+        return copy.copy(user)
+
+    @staticmethod
+    def provision_student_from_auth_service(auth_uuid, student_id, jwt_token):
+        """
+        Create the student bound to its auth UUID, idempotent across workers
+        """
+        # Another flight may have committed the row since our lookup
+        user = StudentUser.objects.filter(one_auth_uuid=auth_uuid).first()
+        if user:
+            return user
 
-            if not profile_data:
-                raise exceptions.AuthenticationFailed('Failed to fetch user profile from auth service')
+        log.info(f"Creating new student user for UUID: {auth_uuid}")
 
-            # Extract user details from auth service response
-            user_details = auth_client.extract_user_details(profile_data)
+        # Fetch user details from auth service
+        profile_data = get_auth_client().get_user_profile(jwt_token)
 
-            if not user_details:
-                raise exceptions.AuthenticationFailed('Failed to extract user details from auth service response')
+        if not profile_data:
+            raise exceptions.AuthenticationFailed('Failed to fetch user profile from auth service')
 
-            log.info(
-                f"Successfully fetched user details from auth service for user ID: {user_details.get('auth_user_id')}")
+        # Extract user details from auth service response
+        user_details = get_auth_client().extract_user_details(profile_data)
 
-            user = StudentUser.objects.create(
+        if not user_details:
+            raise exceptions.AuthenticationFailed('Failed to extract user details from auth service response')
+
+        log.info(
+            f"Successfully fetched user details from auth service for user ID: {user_details.get('auth_user_id')}")
+
+        # INSERT ... ON CONFLICT (one_auth_uuid) DO NOTHING, so a racing worker can never create a duplicate
+        StudentUser.objects.bulk_create([
+            StudentUser(
+                one_auth_uuid=auth_uuid,
                 first_name=user_details.get('first_name', 'User'),
                 last_name=user_details.get('last_name', f'User{student_id}'),
                 email=user_details.get('email', f'user{student_id}@example.com'),
@@ -114,10 +153,12 @@ class JWTAuth(authentication.BaseAuthentication):
                 nationality=user_details.get('nationality'),
                 is_active=True,
             )
+        ], ignore_conflicts=True)
+        user = StudentUser.objects.get(one_auth_uuid=auth_uuid)
 
-            log.info(f"Created new student user with real data: {user_details.get('first_name')} "
-                     f"{user_details.get('last_name')} ({user_details.get('email')})")
-            return user
+        log.info(f"Provisioned student user {user.id} with real data: {user_details.get('first_name')} "
+                 f"{user_details.get('last_name')} ({user_details.get('email')})")
+        return user
 
     @staticmethod
     def get_admin_from_token(admin_details):
@@ -155,10 +196,30 @@ class JWTAuth(authentication.BaseAuthentication):
         except BankAdminUser.DoesNotExist:
             raise exceptions.AuthenticationFailed('Bank Admin user not found in Student Portal')
 
+    @staticmethod
+    def get_token_expiry(token_type, decoded_token):
+        """Epoch seconds at which the token stops being valid"""
+        if token_type == 'student':
+            return decoded_token.get('expired_at')
+        return decoded_token.get('exp')
+
     def authenticate(self, request):
         """
         Main authentication method that handles both student and admin tokens
         """
+        try:
+            raw_token = self.retrieve_raw_jwt_token_from_request(request)
+        except exceptions.AuthenticationFailed:
+            return None
+
+        # Repeat requests with an already verified token skip both the decode and the DB lookup
+        cached_principal = principal_cache.get(raw_token)
+        if cached_principal:
+            user = cached_principal.user
+            user.token_type = cached_principal.token_type
+            user.token_data = cached_principal.decoded_token
+            return user, raw_token
+
         try:
             token, decoded_token = self.retrieve_jwt_token_from_request(request)
         except exceptions.AuthenticationFailed:
@@ -209,6 +270,9 @@ class JWTAuth(authentication.BaseAuthentication):
             if not user.is_active:
                 raise exceptions.AuthenticationFailed('User is inactive')
 
+            principal_cache.set(token, user, token_type, decoded_token,
+                                token_expires_at=self.get_token_expiry(token_type, decoded_token))
+
             user.token_type = token_type
             user.token_data = decoded_token
 
@@ -28,10 +28,10 @@ class IsBankAdmin(permissions.BasePermission):
         if not isinstance(request.user, BankAdminUser):
             return False
 
-        # TODO: Need to gather more knowledge to implement that
-        # if hasattr(request, 'auth_token') and request.auth_token:
-        #     if not verify_supabase_jwt(request.auth_token):
-        #         return False
+        # Signature check runs against the locally cached JWKS, so it adds no network round trip
+        if settings.BANK_ADMIN_VERIFY_SUPABASE_JWT and getattr(request, 'auth_token', None):
+            if not verify_supabase_jwt(request.auth_token):
+                return False
 
         if request.user and hasattr(request, 'service') and request.service == ServiceList.BANK_ADMIN.value:
             return True
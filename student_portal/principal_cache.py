@@ -0,0 +1,137 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+CachedPrincipal = namedtuple('CachedPrincipal', ['user', 'token_type', 'decoded_token', 'expires_at', 'generation'])
+
+
+class PrincipalCache:
+    """
+    Bounded in-process LRU of principals already verified by JWTAuth
+    Keyed by a SHA-256 of the raw token so raw JWTs are never kept in memory
+    Each entry carries the user's generation from the shared cache, any write to the user row on any worker bumps it
+    and the entry stops being served
+    """
+
+    generation_prefix = 'principal_generation_'
+
+    def __init__(self, max_size, max_ttl, enabled=True):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._token_hashes_by_principal = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_principal_key(user):
+        return user._meta.label_lower, user.pk
+
+    def get_generation_key(self, principal_key):
+        return f"{self.generation_prefix}{principal_key[0]}_{principal_key[1]}"
+
+    def get_generation(self, principal_key):
+        # Random rather than a counter, a generation evicted from the cache can never come back with an old value
+        return cache.get_or_set(self.get_generation_key(principal_key), uuid.uuid4().hex, timeout=None)
+
+    def bump_generation(self, model_label, pk):
+        """Invalidate every cached token of a user row on all workers, for writes that bypass save()"""
+        cache.set(self.get_generation_key((model_label, pk)), uuid.uuid4().hex, timeout=None)
+
+    def get(self, token):
+        """Return a private copy of the cached principal, or None on miss/expiry/a newer user generation"""
+        if not self.enabled:
+            return None
+        token_hash = self.hash_token(token)
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                self._discard(token_hash)
+                return None
+            self._entries.move_to_end(token_hash)
+
+        if cache.get(self.get_generation_key(self.get_principal_key(entry.user))) != entry.generation:
+            with self._lock:
+                self._discard(token_hash)
+            return None
+
+        # Callers set token_type/token_data on the user, so never hand out the shared instance
+        return entry._replace(user=copy.copy(entry.user))
+
+    def set(self, token, user, token_type, decoded_token, token_expires_at=None):
+        """Cache a verified principal until the token expires (capped by max_ttl)"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.max_ttl
+        if token_expires_at:
+            expires_at = min(expires_at, float(token_expires_at))
+        if expires_at <= time.time():
+            return
+
+        token_hash = self.hash_token(token)
+        principal_key = self.get_principal_key(user)
+        entry = CachedPrincipal(copy.copy(user), token_type, decoded_token, expires_at,
+                                self.get_generation(principal_key))
+
+        with self._lock:
+            self._discard(token_hash)
+            self._entries[token_hash] = entry
+            self._token_hashes_by_principal.setdefault(principal_key, set()).add(token_hash)
+            while len(self._entries) > self.max_size:
+                oldest_hash = next(iter(self._entries))
+                self._discard(oldest_hash)
+
+    def evict_user(self, user):
+        """Drop every cached token that resolved to this user row, here and on every other worker"""
+        principal_key = self.get_principal_key(user)
+        self.bump_generation(*principal_key)
+        with self._lock:
+            for token_hash in self._token_hashes_by_principal.pop(principal_key, set()):
+                self._entries.pop(token_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._token_hashes_by_principal.clear()
+
+    def _discard(self, token_hash):
+        entry = self._entries.pop(token_hash, None)
+        if entry is None:
+            return
+        principal_key = self.get_principal_key(entry.user)
+        token_hashes = self._token_hashes_by_principal.get(principal_key)
+        if token_hashes is not None:
+            token_hashes.discard(token_hash)
+            if not token_hashes:
+                del self._token_hashes_by_principal[principal_key]
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    max_ttl=settings.PRINCIPAL_CACHE_MAX_TTL,
+    enabled=settings.PRINCIPAL_CACHE_ENABLED,
+)
+
+
+def evict_cached_principal(sender, instance, **kwargs):
+    principal_cache.evict_user(instance)
+
+
+for principal_model in ('students.StudentUser', 'students.CustomUser', 'bank_admin.BankAdminUser'):
+    post_save.connect(evict_cached_principal, sender=principal_model,
+                      dispatch_uid=f'principal_cache_save_{principal_model}')
+    post_delete.connect(evict_cached_principal, sender=principal_model,
+                        dispatch_uid=f'principal_cache_delete_{principal_model}')
@@ -2,6 +2,7 @@
 Django settings for student_portal project.
 """
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -160,8 +161,44 @@ GS_BUCKET_NAME = os.getenv('GS_BUCKET_NAME', 'priyo_pay_dev_docs')
 GS_BUCKET_CREDENTIAL = os.getenv('GS_BUCKET_CREDENTIAL', 'priyo-pay-bucket.json')
 GS_BUCKET_FILE_NAME_MAX_CHAR = 172
 
-# Cache timeout for GCP URLs
+# Lifetime of signed GCP URLs, cached for as long as they are valid
 GS_EXPIRATION = timedelta(hours=1)
+# Signed URLs closer than this to expiring are signed again, keep it above PROFILE_CACHE_TTL
+# since profile snapshots hold URLs for that long
+GS_URL_REFRESH_AHEAD = timedelta(minutes=int(os.getenv('GS_URL_REFRESH_AHEAD_MINUTES', 10)))
+# Concurrent bucket uploads per process
+GS_UPLOAD_MAX_WORKERS = int(os.getenv('GS_UPLOAD_MAX_WORKERS', 8))
+# Concurrent bucket downloads per process, and how many a ZIP export fetches ahead of what it is writing
+GS_DOWNLOAD_MAX_WORKERS = int(os.getenv('GS_DOWNLOAD_MAX_WORKERS', 8))
+STUDENT_DOCUMENT_EXPORT_PREFETCH = int(os.getenv('STUDENT_DOCUMENT_EXPORT_PREFETCH', 4))
+
+# Storage backend for student documents, one instance is shared per process
+STUDENT_DOCUMENT_STORAGE = os.getenv('STUDENT_DOCUMENT_STORAGE',
+                                     'students.utility.document_storage.GoogleCloudDocumentStorage')
+# Filesystem stand-in for the bucket, used with STUDENT_DOCUMENT_STORAGE=students.utility.document_storage.LocalDocumentStorage
+STUDENT_DOCUMENT_LOCAL_ROOT = os.getenv('STUDENT_DOCUMENT_LOCAL_ROOT', str(BASE_DIR / 'local_documents'))
+STUDENT_DOCUMENT_LOCAL_URL = os.getenv('STUDENT_DOCUMENT_LOCAL_URL', '/local-documents/')
+
+STUDENT_DOCUMENT_MAX_SIZE = 5 * 1024 * 1024  # 5MB
+# Largest byte range accepted by a single PUT on a resumable document upload
+STUDENT_DOCUMENT_CHUNK_MAX_SIZE = int(os.getenv('STUDENT_DOCUMENT_CHUNK_MAX_SIZE', 1024 * 1024))
+# Lifetime of signed direct-to-bucket upload URLs
+STUDENT_DOCUMENT_SIGNED_UPLOAD_TTL = timedelta(minutes=int(os.getenv('STUDENT_DOCUMENT_SIGNED_UPLOAD_TTL_MINUTES', 15)))
+# Deferred ingestion (POST /student-documents/ with Prefer: respond-async): files are spooled here
+# and uploaded by a per-process worker pool
+STUDENT_DOCUMENT_INGEST_SPOOL_DIR = os.getenv('STUDENT_DOCUMENT_INGEST_SPOOL_DIR',
+                                              os.path.join(tempfile.gettempdir(), 'student-document-ingest'))
+STUDENT_DOCUMENT_INGEST_MAX_WORKERS = int(os.getenv('STUDENT_DOCUMENT_INGEST_MAX_WORKERS', 4))
+# Superseded bucket objects are kept this long before purge, so URLs already signed for them keep working
+DOCUMENT_GC_DELAY = GS_EXPIRATION
+DOCUMENT_GC_BATCH_SIZE = int(os.getenv('DOCUMENT_GC_BATCH_SIZE', 500))
+# A purger claims its batch for this long, entries it did not settle by then are picked up again
+DOCUMENT_GC_CLAIM_LEASE = timedelta(minutes=int(os.getenv('DOCUMENT_GC_CLAIM_LEASE_MINUTES', 10)))
+# The bucket reconciler only collects unreferenced objects older than this, in-flight uploads are younger
+DOCUMENT_GC_RECONCILE_GRACE = timedelta(hours=int(os.getenv('DOCUMENT_GC_RECONCILE_GRACE_HOURS', 24)))
+# Photograph thumbnails, rendered with Pillow (optional) in a process pool
+THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', 128))  # longest side in px
+THUMBNAIL_MAX_WORKERS = int(os.getenv('THUMBNAIL_MAX_WORKERS', 2))
 
 # Django Storages settings
 DEFAULT_FILE_STORAGE = 'storages.backends.gcloud.GoogleCloudStorage'
@@ -209,6 +246,11 @@ LOGGING = {
 }
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Same as Django's defaults, plus a SHA-256 of each file computed while it streams in
+FILE_UPLOAD_HANDLERS = [
+    'students.utility.upload_handlers.HashingMemoryFileUploadHandler',
+    'students.utility.upload_handlers.HashingTemporaryFileUploadHandler',
+]
 # Enable Swagger conditionally
 _enable_swagger_env = os.getenv("ENABLE_SWAGGER")
 if _enable_swagger_env is None:
@@ -246,18 +288,81 @@ if not AUTH_API_BASE or not AUTH_API_KEY:
 
 PRIYOPAY_API_URL = os.getenv('PRIYOPAY_API_URL')
 PRIYOPAY_API_KEY = os.getenv('PRIYOPAY_API_KEY')
+# Deposit claim and conversion lists are cached for detail lookups (students.utility.priyopay.PriyoPayListCache)
+PRIYOPAY_LIST_CACHE_TTL = int(os.getenv('PRIYOPAY_LIST_CACHE_TTL', 30))  # seconds fresh
+PRIYOPAY_LIST_CACHE_STALE_TTL = int(os.getenv('PRIYOPAY_LIST_CACHE_STALE_TTL', 300))  # then served while refetched, needs CACHE_REDIS_URL
+PRIYOPAY_LIST_CACHE_MISS_REFRESH_AFTER = int(os.getenv('PRIYOPAY_LIST_CACHE_MISS_REFRESH_AFTER', 5))  # unknown id refetches a list older than this
+# Identical concurrent PriyoPay GETs share one upstream call, across workers through the cache when enabled
+PRIYOPAY_COALESCE_ACROSS_WORKERS = os.getenv('PRIYOPAY_COALESCE_ACROSS_WORKERS', 'false').lower() in ("1", "true", "yes")
+PRIYOPAY_COALESCE_WAIT = int(os.getenv('PRIYOPAY_COALESCE_WAIT', 20))  # seconds to wait on another worker's call
+PRIYOPAY_COALESCE_RESULT_TTL = int(os.getenv('PRIYOPAY_COALESCE_RESULT_TTL', 2))  # seconds a shared result is kept
+# Per-operation circuit breakers and bulkheads of the PriyoPay reads, the bulkhead is sized to the outbound connection pool
+PRIYOPAY_BREAKER_FAILURE_THRESHOLD = int(os.getenv('PRIYOPAY_BREAKER_FAILURE_THRESHOLD', 5))  # consecutive failures
+PRIYOPAY_BREAKER_RESET_TIMEOUT = int(os.getenv('PRIYOPAY_BREAKER_RESET_TIMEOUT', 30))  # seconds open before a trial call
+PRIYOPAY_BULKHEAD_MAX_CALLS = int(os.getenv('PRIYOPAY_BULKHEAD_MAX_CALLS', 0))  # in flight per operation and process, 0 uses OUTBOUND_HTTP_POOL_MAXSIZE
+PRIYOPAY_BULKHEAD_MAX_WAIT = float(os.getenv('PRIYOPAY_BULKHEAD_MAX_WAIT', 5))  # seconds to wait for a slot
+# Under ASGI, serve the PriyoPay proxy routes as async views that run the DRF view on their own executor
+# (students.views.async_proxy_view), leave off under WSGI where every async view costs an event loop per request
+PRIYOPAY_ASYNC_PROXY_VIEWS = os.getenv('PRIYOPAY_ASYNC_PROXY_VIEWS', 'false').lower() in ("1", "true", "yes")
+PRIYOPAY_ASYNC_PROXY_MAX_WORKERS = int(os.getenv('PRIYOPAY_ASYNC_PROXY_MAX_WORKERS', 64))  # proxy requests in flight per process
+# Currency conversion quotes are computed from cached PriyoPay rates (students.utility.priyopay.FxRateCache),
+# only for pairs whose responses carry an explicit rate field and no fees
+PRIYOPAY_FX_RATE_TTL = int(os.getenv('PRIYOPAY_FX_RATE_TTL', 60))  # seconds a rate is used
+PRIYOPAY_FX_REFRESH_AHEAD = int(os.getenv('PRIYOPAY_FX_REFRESH_AHEAD', 15))  # refetched this long before expiry
+PRIYOPAY_FX_DECIMAL_PLACES = int(os.getenv('PRIYOPAY_FX_DECIMAL_PLACES', 2))
+PRIYOPAY_FX_RATE_FIELD = os.getenv('PRIYOPAY_FX_RATE_FIELD', 'rate')
+PRIYOPAY_FX_AMOUNT_FIELD = os.getenv('PRIYOPAY_FX_AMOUNT_FIELD', 'amount')
+PRIYOPAY_FX_CONVERTED_FIELD = os.getenv('PRIYOPAY_FX_CONVERTED_FIELD', 'converted_amount')
+# Local mirrors of PriyoPay deposit claims and conversions (students.utility.priyopay_mirror), synced by sync_priyopay_mirror
+PRIYOPAY_MIRROR_READS = os.getenv('PRIYOPAY_MIRROR_READS', 'false').lower() in ("1", "true", "yes")
+PRIYOPAY_MIRROR_MAX_LAG = int(os.getenv('PRIYOPAY_MIRROR_MAX_LAG', 900))  # seconds since the last sync reads are served for
+PRIYOPAY_MIRROR_UPDATED_SINCE_PARAM = os.getenv('PRIYOPAY_MIRROR_UPDATED_SINCE_PARAM', 'updated_after')
+PRIYOPAY_MIRROR_CURSOR_OVERLAP = int(os.getenv('PRIYOPAY_MIRROR_CURSOR_OVERLAP', 120))  # seconds refetched for clock skew
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+SUPABASE_JWKS_TTL = int(os.getenv('SUPABASE_JWKS_TTL', 600))  # background refresh interval, seconds
+SUPABASE_JWKS_MIN_REFETCH_INTERVAL = int(os.getenv('SUPABASE_JWKS_MIN_REFETCH_INTERVAL', 30))  # on unknown kid
+SUPABASE_JWKS_TIMEOUT = float(os.getenv('SUPABASE_JWKS_TIMEOUT', 5))
+SUPABASE_JWT_ALGORITHMS = os.getenv('SUPABASE_JWT_ALGORITHMS', 'ES256,RS256').split(',')
+# Bank admin Supabase tokens are verified against the JWKS, only with algorithms in SUPABASE_JWT_ALGORITHMS
+BANK_ADMIN_VERIFY_SUPABASE_JWT = os.getenv('BANK_ADMIN_VERIFY_SUPABASE_JWT', 'true').lower() in ("1", "true", "yes")
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+# Outbound HTTP to PriyoPay, the auth service and Supabase (utilities.http_client), one keep-alive pool per upstream
+OUTBOUND_HTTP_CONNECT_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_CONNECT_TIMEOUT', 3.05))
+OUTBOUND_HTTP_READ_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_READ_TIMEOUT', 15))
+OUTBOUND_HTTP_MAX_RETRIES = int(os.getenv('OUTBOUND_HTTP_MAX_RETRIES', 2))  # idempotent methods only
+OUTBOUND_HTTP_BACKOFF_FACTOR = float(os.getenv('OUTBOUND_HTTP_BACKOFF_FACTOR', 0.3))
+OUTBOUND_HTTP_POOL_MAXSIZE = int(os.getenv('OUTBOUND_HTTP_POOL_MAXSIZE', 20))  # connections kept per host
+
+# Shared by all workers when CACHE_REDIS_URL is set (signed document URLs, principals), per-process otherwise
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
     }
-}
-# Profile caching ( I wish to implement caching later on )
-PROFILE_CACHE_PREFIX = "profile-"
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "unique-snowflake",
+        }
+    }
+# Caches whose invalidation must reach every worker are only switched on when the default cache is shared
+CACHE_IS_SHARED = bool(CACHE_REDIS_URL)
+# Materialized StudentCompleteProfileSerializer snapshots (StudentProfileSnapshot rows), rebuilt on writes by model
+# signals (see students.utility.profile_snapshot), ignored once older than PROFILE_CACHE_TTL
 PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 300))  # 5 minutes
+# Verified-principal cache used by JWTAuth (entries also expire with the token itself)
+# Entries are checked against a per-user generation in the shared cache, so it needs CACHE_REDIS_URL
+PRINCIPAL_CACHE_ENABLED = CACHE_IS_SHARED and os.getenv('PRINCIPAL_CACHE_ENABLED', 'true').lower() in ("1", "true", "yes")
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv('PRINCIPAL_CACHE_MAX_SIZE', 2048))
+PRINCIPAL_CACHE_MAX_TTL = int(os.getenv('PRINCIPAL_CACHE_MAX_TTL', 300))  # 5 minutes
+# In-process api-key hash -> service snapshot used by AuthMiddleware, ServiceKey writes reload it on every worker
+# through a generation in the default cache, so that needs CACHE_REDIS_URL too
+SERVICE_KEY_INDEX_TTL = int(os.getenv('SERVICE_KEY_INDEX_TTL', 60))  # seconds
 
 # Swagger Configuration
 SWAGGER_SETTINGS = {
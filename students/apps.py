@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class StudentsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'students'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from students import signals
+
+        post_migrate.connect(signals.backfill_student_onboarding_state, sender=self,
+                             dispatch_uid='backfill_student_onboarding_state')
@@ -19,6 +19,11 @@ class StudentOnboardingSteps(Enum):
     def values(cls):
         return [step.value for step in cls]
 
+    @classmethod
+    def mask_bit(cls, step):
+        """Bit representing a step in StudentUser.onboarding_steps_mask"""
+        return 1 << cls.values().index(step)
+
 
 class AbstractEnumChoices(Enum):
     @classmethod
@@ -1,8 +1,11 @@
 from django_filters.rest_framework import FilterSet
 from .models import *
 
-from django_filters.rest_framework import FilterSet, BooleanFilter, CharFilter
+from django_filters.rest_framework import FilterSet, BooleanFilter, CharFilter, ChoiceFilter, NumberFilter, \
+    IsoDateTimeFilter, OrderingFilter
+from django.db.models import F
 from django.contrib.auth import get_user_model
+from .enums import StudentOnboardingSteps
 from .models import *
 
 # User = get_user_model()
@@ -54,6 +57,44 @@ class StudentUsersFilterSet(FilterSet):
     # last_name = CharFilter(field_name='student_user__last_name', lookup_expr='icontains')
     # email = CharFilter(field_name='student_user__email', lookup_expr='icontains')
 
+    # Onboarding stage filters run against the denormalized, indexed columns on StudentUser
+    onboarding_stage = ChoiceFilter(field_name='last_onboarding_step', choices=StudentOnboardingSteps.choices())
+    completed_onboarding_step = ChoiceFilter(choices=StudentOnboardingSteps.choices(),
+                                             method='filter_completed_onboarding_step')
+    min_onboarding_progress = NumberFilter(field_name='onboarding_progress', lookup_expr='gte')
+    max_onboarding_progress = NumberFilter(field_name='onboarding_progress', lookup_expr='lte')
+
     class Meta:
         model = StudentUser
         fields = ['is_approved', 'nationality', 'is_active', 'first_name', 'last_name', 'email']
+
+    def filter_completed_onboarding_step(self, queryset, name, value):
+        step_bit = StudentOnboardingSteps.mask_bit(value)
+        return queryset.annotate(
+            completed_step_bit=F('onboarding_steps_mask').bitand(step_bit)
+        ).filter(completed_step_bit=step_bit)
+
+
+class MirroredPriyoPayFilterSet(FilterSet):
+    """Admin list filters over a PriyoPay mirror, every one of them served by an index"""
+    updated_since = IsoDateTimeFilter(field_name='remote_updated_at', lookup_expr='gte')
+    updated_before = IsoDateTimeFilter(field_name='remote_updated_at', lookup_expr='lt')
+    ordering = OrderingFilter(fields=('remote_created_at', 'remote_updated_at', 'amount', 'status'))
+
+    class Meta:
+        fields = ['status', 'student_id']
+
+
+class MirroredDepositClaimFilterSet(MirroredPriyoPayFilterSet):
+    class Meta(MirroredPriyoPayFilterSet.Meta):
+        model = MirroredDepositClaim
+
+
+class MirroredConversionFilterSet(MirroredPriyoPayFilterSet):
+    class Meta(MirroredPriyoPayFilterSet.Meta):
+        model = MirroredConversion
+
+
+class MirroredBdtUsdConversionFilterSet(MirroredPriyoPayFilterSet):
+    class Meta(MirroredPriyoPayFilterSet.Meta):
+        model = MirroredBdtUsdConversion
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from students.models import StudentDocument
+from students.utility.thumbnails import THUMBNAIL_DOCUMENT_TYPES, needs_thumbnail, generate_thumbnail, Image
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnails for photographs uploaded before thumbnails were generated at upload time'
+
+    def handle(self, *args, **options):
+        if Image is None:
+            self.stderr.write('Pillow is not installed')
+            return
+
+        generated = failed = 0
+        documents = StudentDocument.objects.filter(
+            document_type__in=THUMBNAIL_DOCUMENT_TYPES, thumbnail_file_name__isnull=True
+        ).only('id', 'user_id', 'document_type', 'uploaded_file_name', 'thumbnail_file_name')
+
+        for document in documents.iterator():
+            if not needs_thumbnail(document):
+                continue
+            try:
+                generate_thumbnail(document.id, document.user_id, document.uploaded_file_name)
+                generated += 1
+            except Exception as ex:
+                failed += 1
+                self.stderr.write(f'Document {document.id}: {ex}')
+        self.stdout.write(self.style.SUCCESS(f'Generated {generated} thumbnails, {failed} failed'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from students.utility.document_gc import purge_orphaned_objects
+
+
+class Command(BaseCommand):
+    help = 'Delete queued orphaned document objects from the bucket in batches, run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches, by default run until nothing is due')
+
+    def handle(self, *args, **options):
+        processed = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count = purge_orphaned_objects(options['batch_size'])
+            if not count:
+                break
+            processed += count
+            batches += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} orphaned objects in {batches} batches'))
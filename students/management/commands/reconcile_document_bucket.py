@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from students.utility.document_gc import reconcile_bucket
+
+
+class Command(BaseCommand):
+    help = 'Queue bucket objects under STUDENT/u{id}/ that no StudentDocument references, run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student-id', type=int, action='append', dest='student_ids',
+                            help='Only reconcile these students, may be repeated')
+        parser.add_argument('--grace-hours', type=int, default=None,
+                            help='Skip objects younger than this, defaults to DOCUMENT_GC_RECONCILE_GRACE')
+
+    def handle(self, *args, **options):
+        grace = timedelta(hours=options['grace_hours']) if options['grace_hours'] is not None else None
+        orphaned = reconcile_bucket(options['student_ids'], grace)
+        self.stdout.write(self.style.SUCCESS(f'Queued {orphaned} orphaned objects for purge'))
@@ -0,0 +1,39 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from students.models import StudentDocumentIngestJob
+from students.utility.document_ingest import get_spool_dir
+from students.viewsets import StudentDocumentsViewSet
+
+
+class Command(BaseCommand):
+    help = ('Re-run deferred document uploads left unfinished by a restarted worker, '
+            'run on the host that holds the spool directory')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=15,
+                            help='Only jobs with no progress for this long are picked up')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        jobs = StudentDocumentIngestJob.objects.filter(
+            status__in=[StudentDocumentIngestJob.STATUS_PENDING, StudentDocumentIngestJob.STATUS_PROCESSING],
+            updated_at__lt=cutoff,
+        ).values_list('id', flat=True)
+
+        resumed = lost = 0
+        for job_id in jobs:
+            if not os.path.isdir(get_spool_dir(job_id)):
+                # Spooled on another host, or already cleaned up
+                StudentDocumentIngestJob.objects.filter(id=job_id).update(
+                    status=StudentDocumentIngestJob.STATUS_FAILED, error='Spooled files are no longer available',
+                    updated_at=timezone.now(),
+                )
+                lost += 1
+                continue
+            StudentDocumentsViewSet.ingest_student_documents(job_id)
+            resumed += 1
+        self.stdout.write(self.style.SUCCESS(f'Resumed {resumed} ingest jobs, {lost} could not be recovered'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from students.models import StudentUser
+from students.utility.onboarding_state import sync_onboarding_state
+
+
+class Command(BaseCommand):
+    help = 'Backfill the denormalized onboarding columns on StudentUser from StudentOnboardingStep'
+
+    def handle(self, *args, **options):
+        synced = 0
+        for student_id in StudentUser.objects.values_list('id', flat=True).iterator():
+            sync_onboarding_state(student_id)
+            synced += 1
+        self.stdout.write(self.style.SUCCESS(f'Synced onboarding state for {synced} students'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from students.utility.priyopay_mirror import priyopay_mirrors
+
+
+class Command(BaseCommand):
+    help = 'Sync the local mirrors of PriyoPay deposit claims and conversions, run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mirror', choices=sorted(priyopay_mirrors), action='append',
+                            help='Mirror to sync, can be repeated, by default all of them')
+        parser.add_argument('--full', action='store_true', help='Ignore the updated-since cursor')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete local records missing from a full fetch that read every page')
+
+    def handle(self, *args, **options):
+        failed = []
+        for name in options['mirror'] or sorted(priyopay_mirrors):
+            try:
+                fetched, written = priyopay_mirrors[name].sync(full=options['full'], prune=options['prune'])
+            except Exception as ex:
+                failed.append(name)
+                self.stderr.write(f'{name}: {ex}')
+                continue
+            self.stdout.write(self.style.SUCCESS(f'{name}: fetched {fetched}, wrote {written}'))
+
+        if failed:
+            raise CommandError(f"Sync failed for {', '.join(failed)}")
@@ -1,8 +1,11 @@
+import uuid
 from django.utils import timezone
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
 from students.enums import StudentOnboardingSteps, ServiceList
+from students.utility.service_key_index import service_key_index
 from utilities.model_mixins import TimeStampMixin
 
 
@@ -44,6 +47,19 @@ class StudentUser(TimeStampMixin):
     last_login = models.DateTimeField(null=True, blank=True)
     date_joined = models.DateTimeField(default=timezone.now)
 
+    # Denormalized from StudentOnboardingStep by students.utility.onboarding_state
+    onboarding_steps_mask = models.PositiveIntegerField(default=0)
+    last_onboarding_step = models.CharField(max_length=50, choices=StudentOnboardingSteps.choices(), null=True,
+                                            blank=True)
+    onboarding_progress = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['onboarding_steps_mask']),
+            models.Index(fields=['last_onboarding_step']),
+            models.Index(fields=['onboarding_progress']),
+        ]
+
 
 class StudentAddress(TimeStampMixin):
     """Student address - matches priyo_pay_backend pattern"""
@@ -168,6 +184,14 @@ class StudentOnboardingStep(TimeStampMixin):
         unique_together = ('user', 'step')
 
 
+class StudentProfileSnapshot(models.Model):
+    """Materialized StudentCompleteProfileSerializer output of one student, see students.utility.profile_snapshot"""
+    user = models.OneToOneField(StudentUser, on_delete=models.CASCADE, primary_key=True,
+                                related_name='profile_snapshot')
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    built_at = models.DateTimeField(auto_now=True)
+
+
 # Add these document types to your existing StudentDocument model
 class StudentDocument(TimeStampMixin):
     """Student documents/files - matches priyo_pay_backend Documents model"""
@@ -198,9 +222,146 @@ class StudentDocument(TimeStampMixin):
     doc_type = models.CharField(max_length=32, default='STUDENT_DOCUMENTS')
     related_resource_type = models.CharField(max_length=50, default='student')
     verification_status = models.CharField(max_length=16, default='UNVERIFIED')
+    # SHA-256 of the stored object, a resubmission with the same content reuses it
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    # Small WebP/JPEG rendition of photographs, served as profile_image_icon
+    thumbnail_file_name = models.CharField(max_length=256, null=True, blank=True)
 
     class Meta:
         ordering = ('-updated_at',)
+        indexes = [
+            models.Index(fields=['user', 'document_type', 'content_hash']),
+        ]
+
+
+
+class StudentDocumentUpload(TimeStampMixin):
+    """Resumable chunked upload session, finalized into a StudentDocument"""
+    STATUS_IN_PROGRESS = 'IN_PROGRESS'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'In Progress'),
+        (STATUS_COMPLETED, 'Completed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(StudentUser, on_delete=models.CASCADE, related_name='student_document_uploads')
+    document_type = models.CharField(max_length=50, choices=StudentDocument.DOCUMENT_TYPES)
+    original_filename = models.CharField(max_length=255)
+    total_size = models.PositiveIntegerField()
+    received_bytes = models.PositiveIntegerField(default=0)
+    # Stored byte ranges in offset order: [{"offset": ..., "size": ..., "name": bucket path}]
+    parts = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_IN_PROGRESS)
+    document = models.ForeignKey(StudentDocument, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='uploads')
+
+    class Meta:
+        ordering = ('-created_at',)
+
+
+
+class StudentDocumentIngestJob(TimeStampMixin):
+    """Deferred multipart document upload, spooled to local disk and ingested by a background worker"""
+    STATUS_PENDING = 'PENDING'
+    STATUS_PROCESSING = 'PROCESSING'
+    STATUS_COMPLETED = 'COMPLETED'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    # Per-file progress
+    FILE_PENDING = 'PENDING'
+    FILE_UPLOADED = 'UPLOADED'
+    FILE_FAILED = 'FAILED'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(StudentUser, on_delete=models.CASCADE, related_name='student_document_ingest_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # document type -> {original_filename, file_size, content_hash, status, error, document}
+    files = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+class OrphanedDocumentObject(TimeStampMixin):
+    """Queue of bucket objects no longer referenced by a document, purged in batches by purge_orphaned_documents"""
+    file_name = models.CharField(max_length=256, unique=True)  # GCP path
+    reason = models.CharField(max_length=32)
+    delete_after = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('delete_after',)
+        indexes = [
+            models.Index(fields=['delete_after']),
+        ]
+
+
+class MirroredPriyoPayRecord(TimeStampMixin):
+    """
+    Local copy of a PriyoPay record, the payload as PriyoPay returned it plus the columns admin lists filter on
+    Kept current by sync_priyopay_mirror and written through by the proxy PATCH endpoints
+    """
+    remote_id = models.CharField(max_length=64, unique=True)
+    alternate_id = models.CharField(max_length=64, null=True, blank=True, db_index=True)  # claim_id / conversion_id
+    student_id = models.CharField(max_length=64, null=True, blank=True)
+    status = models.CharField(max_length=32, null=True, blank=True)
+    amount = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True)
+    remote_created_at = models.DateTimeField(null=True, blank=True)
+    remote_updated_at = models.DateTimeField(null=True, blank=True)
+    payload = models.JSONField(default=dict)
+
+    class Meta:
+        abstract = True
+        ordering = ('-remote_updated_at',)
+
+
+class MirroredDepositClaim(MirroredPriyoPayRecord):
+    class Meta(MirroredPriyoPayRecord.Meta):
+        indexes = [
+            models.Index(fields=['status', 'remote_updated_at'], name='mirror_deposit_status_idx'),
+            models.Index(fields=['student_id', 'remote_updated_at'], name='mirror_deposit_student_idx'),
+            models.Index(fields=['remote_updated_at'], name='mirror_deposit_updated_idx'),
+            models.Index(fields=['remote_created_at'], name='mirror_deposit_created_idx'),
+        ]
+
+
+class MirroredConversion(MirroredPriyoPayRecord):
+    class Meta(MirroredPriyoPayRecord.Meta):
+        indexes = [
+            models.Index(fields=['status', 'remote_updated_at'], name='mirror_conv_status_idx'),
+            models.Index(fields=['student_id', 'remote_updated_at'], name='mirror_conv_student_idx'),
+            models.Index(fields=['remote_updated_at'], name='mirror_conv_updated_idx'),
+            models.Index(fields=['remote_created_at'], name='mirror_conv_created_idx'),
+        ]
+
+
+class MirroredBdtUsdConversion(MirroredPriyoPayRecord):
+    class Meta(MirroredPriyoPayRecord.Meta):
+        indexes = [
+            models.Index(fields=['status', 'remote_updated_at'], name='mirror_bdtusd_status_idx'),
+            models.Index(fields=['student_id', 'remote_updated_at'], name='mirror_bdtusd_student_idx'),
+            models.Index(fields=['remote_updated_at'], name='mirror_bdtusd_updated_idx'),
+            models.Index(fields=['remote_created_at'], name='mirror_bdtusd_created_idx'),
+        ]
+
+
+class PriyoPaySyncCursor(TimeStampMixin):
+    """Where the incremental sync of one mirror left off"""
+    name = models.CharField(max_length=32, unique=True)
+    updated_since = models.DateTimeField(null=True, blank=True)  # newest remote_updated_at seen
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
 
 
 class ServiceKey(models.Model):
@@ -221,13 +382,9 @@ class ServiceKey(models.Model):
 
     @classmethod
     def get_service_from_api_key(cls, api_key):
-        if not cls.objects.filter(secret_key=api_key).exists():
-            return None, None
-        service_key = cls.objects.filter(secret_key=api_key).first()
-        return service_key.service
+        return service_key_index.get_service(api_key)
 
     @classmethod
     def get_key_from_service(cls, service):
-        if not cls.objects.filter(service=service).exists():
-            return None
-        return cls.objects.filter(service=service).first().secret_key
+        # Raw keys are not kept in the in-process index
+        return cls.objects.filter(service=service).values_list('secret_key', flat=True).first()
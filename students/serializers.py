@@ -1,8 +1,10 @@
+from django.conf import settings
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
 # from django.contrib.auth import get_user_model
 from students.models import *
-from students.validators import FileValidator
-from students.utility.document_helper import google_bucket_file_url
+from students.validators import FileValidator, DOCUMENT_EXTENSIONS, validate_files
+from students.utility.document_helper import google_bucket_file_url, google_bucket_file_urls
 
 # User = get_user_model()
 
@@ -140,6 +142,20 @@ class StudentFinancerInfoSerializer(StudentUserAutoCreateMixin, serializers.Mode
 # In students/serializers.py - ONLY replace the StudentUserSerializer class
 # Keep everything else unchanged
 
+class StudentUserListSerializer(serializers.ListSerializer):
+    """Signs the profile photographs of a whole page in one batch before rendering the rows"""
+
+    def to_representation(self, data):
+        students = list(data.all() if isinstance(data, BaseManager) else data)
+        if self.child.context.get('include_profile_image_icon'):
+            self.child.document_urls = google_bucket_file_urls(
+                getattr(student, 'photograph_thumbnail_file_name', None)
+                or getattr(student, 'photograph_file_name', None)
+                for student in students
+            )
+        return super().to_representation(students)
+
+
 class StudentUserSerializer(serializers.ModelSerializer):
     """Matches old backend StudentUserSerializer response format"""
     # user = serializers.IntegerField(source='id', read_only=True)
@@ -166,6 +182,7 @@ class StudentUserSerializer(serializers.ModelSerializer):
     # date_joined = serializers.DateTimeField(read_only=True)
     
     class Meta:
+        list_serializer_class = StudentUserListSerializer
         model = StudentUser  # Changed to User model since that's what the viewset returns
         fields = [
             'id', 'one_auth_uuid', 'first_name', 'last_name', 'email', 'mobile_number', 'date_of_birth', 'gender',
@@ -173,18 +190,25 @@ class StudentUserSerializer(serializers.ModelSerializer):
             'profile_image_icon', 'last_onboarding_step', 'date_joined'
         ]
     
+    # Rows from profile_loader.annotate_student_list carry these values already, others fall back to a query
     def get_university(self, obj):
         """Get latest university from educations - obj is User"""
+        if hasattr(obj, 'latest_institution_name'):
+            return obj.latest_institution_name
         education = obj.student_educations.order_by('-created_at').first()
         return education.institution_name if education else None
     
     def get_department(self, obj):
         """Get latest department from educations - obj is User"""  
+        if hasattr(obj, 'latest_field_of_study'):
+            return obj.latest_field_of_study
         education = obj.student_educations.order_by('-created_at').first()
         return education.field_of_study if education else None
     
     def get_foreign_university(self, obj):
         """Get foreign university info - obj is User"""
+        if hasattr(obj, 'latest_foreign_university'):
+            return obj.latest_foreign_university
         foreign_uni = obj.student_foreign_universities.order_by('-created_at').first()
         if foreign_uni:
             return {
@@ -200,13 +224,21 @@ class StudentUserSerializer(serializers.ModelSerializer):
         if not self.context.get('include_profile_image_icon'):
             return None
         
-        # Look for student photograph in documents
-        document = obj.student_documents.filter(
-            document_type='student_photograph'
-        ).first()
+        # Serve the thumbnail, the original photograph until one has been rendered
+        if hasattr(obj, 'photograph_file_name'):
+            file_name = obj.photograph_thumbnail_file_name or obj.photograph_file_name
+        else:
+            # Look for student photograph in documents
+            document = obj.student_documents.filter(
+                document_type='student_photograph'
+            ).first()
+            file_name = (document.thumbnail_file_name or document.uploaded_file_name) if document else None
         
-        if document and document.uploaded_file_name:
-            return google_bucket_file_url(document.uploaded_file_name)
+        if file_name:
+            document_urls = getattr(self, 'document_urls', None)
+            if document_urls is not None and file_name in document_urls:
+                return document_urls[file_name]
+            return google_bucket_file_url(file_name)
         return None
     
     def get_mobile_number(self, obj):
@@ -223,21 +255,13 @@ class StudentUserSerializer(serializers.ModelSerializer):
     
     def get_last_onboarding_step(self, obj):
         """Get last completed onboarding step - obj is User"""
-        finished_steps = obj.student_onboarding_steps.filter(is_completed=True).values_list('step', flat=True)
-        
-        expected_steps = [
-            'student_primary_info', 'student_education', 'student_experience',
-            'student_foreign_university', 'student_financial_info', 
-            'student_financer_info', 'student_documents_upload'
-        ]
-        
-        for step in reversed(expected_steps):
-            if step in finished_steps:
-                return step
-        return None
+        return obj.last_onboarding_step
 
 class StudentCompleteProfileSerializer(serializers.ModelSerializer):
-    """Complete student profile - matches old backend PriyoMoneyUserSerializer format"""
+    """
+    Complete student profile - matches old backend PriyoMoneyUserSerializer format
+    Load instances through students.utility.profile_loader so every field reads prefetched data
+    """
     
     # Related data - matches old backend nested structure
     addresses = serializers.SerializerMethodField()
@@ -309,32 +333,52 @@ class StudentCompleteProfileSerializer(serializers.ModelSerializer):
         except:
             return None
     
+    def get_document_urls(self, obj):
+        """Signed URLs for all of the student's documents, resolved in one batch per student"""
+        cached = getattr(self, '_document_urls', None)
+        if cached is None or cached[0] != obj.pk:
+            urls = google_bucket_file_urls(
+                file_name
+                for doc in obj.student_documents.all()
+                for file_name in (doc.uploaded_file_name, doc.thumbnail_file_name)
+            )
+            cached = self._document_urls = (obj.pk, urls)
+        return cached[1]
+
     def get_documents(self, obj):
         documents = obj.student_documents.all()
-        return StudentDocumentSerializer(documents, many=True).data
+        serializer = StudentDocumentSerializer(documents, many=True)
+        serializer.child.document_urls = self.get_document_urls(obj)
+        return serializer.data
     
+    @staticmethod
+    def get_latest_education(obj):
+        """Latest education picked in memory from the prefetched rows"""
+        educations = obj.student_educations.all()
+        return max(educations, key=lambda education: education.created_at, default=None)
+
     def get_university(self, obj):
-        education = obj.student_educations.order_by('-created_at').first()
+        education = self.get_latest_education(obj)
         return education.institution_name if education else None
     
     def get_department(self, obj):
-        education = obj.student_educations.order_by('-created_at').first()
+        education = self.get_latest_education(obj)
         return education.field_of_study if education else None
     
     def get_profile_image_icon(self, obj):
-        document = obj.student_documents.filter(
-            document_type='student_photograph'
-        ).first()
+        # Documents are prefetched in model ordering (-updated_at), same as .filter(...).first()
+        document = next(
+            (doc for doc in obj.student_documents.all() if doc.document_type == 'student_photograph'), None
+        )
         
         if document and document.uploaded_file_name:
-
-            return google_bucket_file_url(document.uploaded_file_name)
+            # Thumbnail when one has been rendered, the original photograph otherwise
+            return self.get_document_urls(obj).get(document.thumbnail_file_name or document.uploaded_file_name)
         return None
     
     def get_onboarding_progress(self, obj):
         """Get onboarding progress - matches old backend"""
-        steps = obj.student_onboarding_steps.all()
-        finished_steps = steps.values_list('step', flat=True)
+        steps_by_name = {step_obj.step: step_obj for step_obj in obj.student_onboarding_steps.all()}
         
         expected_steps = [
             'student_primary_info', 'student_education', 'student_experience',
@@ -344,10 +388,10 @@ class StudentCompleteProfileSerializer(serializers.ModelSerializer):
         
         progress = []
         for step in expected_steps:
-            step_obj = steps.filter(step=step).first()
+            step_obj = steps_by_name.get(step)
             progress.append({
                 'step': step,
-                'finished': step in finished_steps,
+                'finished': step in steps_by_name,
                 'is_completed': step_obj.is_completed if step_obj else False,
                 'completed_at': step_obj.completed_at if step_obj else None
             })
@@ -363,55 +407,96 @@ class StudentCompleteProfileSerializer(serializers.ModelSerializer):
 
 
 
+class StudentDocumentListSerializer(serializers.ListSerializer):
+    """Signs the URLs of every document in the list in one batch before rendering them"""
+
+    def to_representation(self, data):
+        documents = list(data.all() if isinstance(data, BaseManager) else data)
+        if getattr(self.child, 'document_urls', None) is None:
+            self.child.document_urls = google_bucket_file_urls(doc.uploaded_file_name for doc in documents)
+        return super().to_representation(documents)
+
+
 class StudentDocumentSerializer(serializers.ModelSerializer):
     gcp_url = serializers.SerializerMethodField()  # ✅ CORRECT
     
     def get_gcp_url(self, obj):
         """Get GCP URL using same method as old backend"""
         if obj.uploaded_file_name:
+            # Set by StudentDocumentListSerializer when rendering a list
+            document_urls = getattr(self, 'document_urls', None)
+            if document_urls is not None:
+                return document_urls.get(obj.uploaded_file_name)
             return google_bucket_file_url(obj.uploaded_file_name)
         return None
     
     class Meta:
+        list_serializer_class = StudentDocumentListSerializer
         model = StudentDocument
         fields = '__all__'
-        read_only_fields = ('user', 'created_at', 'updated_at', 'uploaded_file_name', 'gcp_url')
+        read_only_fields = ('user', 'created_at', 'updated_at', 'uploaded_file_name', 'gcp_url', 'content_hash',
+                            'thumbnail_file_name')
 
 class StudentDocumentUploadSerializer(serializers.Serializer):
-    """Document upload - matches old backend pattern"""
-    student_photograph = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    financer_photograph = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    student_signature = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    financer_signature = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    admission_letter = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    educational_certificate = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    educational_transcript = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    university_invoice = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    financial_estimate = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    language_test_result = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
-    other_documents = serializers.FileField(required=False, validators=[
-        FileValidator(max_size=5*1024*1024, allowed_extensions=('pdf', 'jpg', 'png', 'jpeg'))
-    ])
+    """
+    Document upload - matches old backend pattern
+    Files are validated together in validate(), before any of them is uploaded
+    """
+    document_validator = FileValidator(max_size=settings.STUDENT_DOCUMENT_MAX_SIZE,
+                                       allowed_extensions=DOCUMENT_EXTENSIONS)
+
+    student_photograph = serializers.FileField(required=False)
+    financer_photograph = serializers.FileField(required=False)
+    student_signature = serializers.FileField(required=False)
+    financer_signature = serializers.FileField(required=False)
+    admission_letter = serializers.FileField(required=False)
+    educational_certificate = serializers.FileField(required=False)
+    educational_transcript = serializers.FileField(required=False)
+    university_invoice = serializers.FileField(required=False)
+    financial_estimate = serializers.FileField(required=False)
+    language_test_result = serializers.FileField(required=False)
+    other_documents = serializers.FileField(required=False)
+
+    def validate(self, attrs):
+        errors = validate_files({field: value for field, value in attrs.items() if value}, self.document_validator)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class StudentDocumentUploadStartSerializer(serializers.Serializer):
+    """Start a resumable upload - the same extension and size rules as the multipart upload, checked up front"""
+    document_type = serializers.ChoiceField(choices=StudentDocument.DOCUMENT_TYPES)
+    filename = serializers.CharField(max_length=255)
+    total_size = serializers.IntegerField(min_value=1, max_value=settings.STUDENT_DOCUMENT_MAX_SIZE)
+
+    def validate_filename(self, value):
+        extension = value.rsplit('.', 1)[-1].lower() if '.' in value else ''
+        if extension not in DOCUMENT_EXTENSIONS:
+            raise serializers.ValidationError(f"Extension '{extension}' not allowed. "
+                                              f"Allowed extensions are: {', '.join(DOCUMENT_EXTENSIONS)}")
+        return value
+
+
+class StudentDocumentSignedUploadCompleteSerializer(serializers.Serializer):
+    upload_token = serializers.CharField()
+
+
+class StudentDocumentUploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudentDocumentUpload
+        fields = ('id', 'document_type', 'original_filename', 'total_size', 'received_bytes', 'status', 'document',
+                  'created_at', 'updated_at')
+        read_only_fields = fields
+
+
+
+class StudentDocumentIngestJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudentDocumentIngestJob
+        fields = ('id', 'status', 'files', 'error', 'created_at', 'updated_at')
+        read_only_fields = fields
+
 class StudentOnboardingStepSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentOnboardingStep
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from students.models import StudentOnboardingStep, StudentUser
+from students.utility.onboarding_state import sync_onboarding_state, backfill_onboarding_state
+from students.utility.profile_snapshot import PROFILE_SNAPSHOT_SECTIONS, schedule_profile_snapshot_rebuild, \
+    schedule_profile_snapshot_rebuild_for
+
+
+@receiver(post_save, sender=StudentOnboardingStep, dispatch_uid='sync_onboarding_state_on_save')
+@receiver(post_delete, sender=StudentOnboardingStep, dispatch_uid='sync_onboarding_state_on_delete')
+def sync_student_onboarding_state(sender, instance, **kwargs):
+    """Every write to a step, whatever the code path, refreshes the owner's onboarding columns"""
+    sync_onboarding_state(instance.user_id)
+
+
+def rebuild_profile_snapshot_section(sender, instance, **kwargs):
+    """Writes to a related row from any code path (viewsets, student_admin, shell) refresh the owner's snapshot"""
+    schedule_profile_snapshot_rebuild_for(instance)
+
+
+for section_model in PROFILE_SNAPSHOT_SECTIONS:
+    post_save.connect(rebuild_profile_snapshot_section, sender=section_model,
+                      dispatch_uid=f'profile_snapshot_save_{section_model.__name__}')
+    post_delete.connect(rebuild_profile_snapshot_section, sender=section_model,
+                        dispatch_uid=f'profile_snapshot_delete_{section_model.__name__}')
+
+
+@receiver(post_save, sender=StudentUser, dispatch_uid='profile_snapshot_save_student')
+def rebuild_student_profile_snapshot(sender, instance, **kwargs):
+    schedule_profile_snapshot_rebuild(instance.id)
+
+
+def backfill_student_onboarding_state(sender, **kwargs):
+    """Every migrate fills in onboarding columns never computed, so progress is right from the first deploy"""
+    backfill_onboarding_state(using=kwargs.get('using'))
@@ -0,0 +1,551 @@
+import json
+import hashlib
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile, InMemoryUploadedFile, TemporaryUploadedFile
+from django.test import TestCase, SimpleTestCase, RequestFactory, AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from students.enums import ServiceList
+from students.filters import MirroredConversionFilterSet
+from students.models import ServiceKey, StudentUser, StudentDocument, StudentDocumentUpload, CustomUser, \
+    StudentProfileSnapshot, OrphanedDocumentObject, MirroredConversion, PriyoPaySyncCursor, StudentOnboardingStep, \
+    StudentDocumentIngestJob
+from students.utility.document_gc import enqueue_orphaned_objects, purge_orphaned_objects
+from students.utility.document_helper import get_document_storage
+from students.utility.priyopay import GuardedPriyoPayClient, FxRateCache, PriyoPayListCache
+from students.utility.priyopay_mirror import PriyoPayMirror
+from students.utility.profile_loader import load_student_profile
+from students.utility.profile_snapshot import build_profile_snapshot
+from students.utility.service_key_index import ServiceKeyIndex
+from students.views import async_proxy_view
+from students.viewsets import StudentDocumentsViewSet
+from student_portal.principal_cache import PrincipalCache, principal_cache
+from utilities.circuit_breaker import CircuitBreaker, CircuitOpenError, UpstreamUnavailable
+
+PDF_CONTENT = b'%PDF-1.4\n' + b'0' * 4087 + b'\n%%EOF\n'
+
+
+class ServiceKeyIndexTests(TestCase):
+
+    def test_revoked_key_is_dropped_by_every_worker(self):
+        service_key = ServiceKey.objects.create(secret_key='rotated-test-key', service=ServiceList.STUDENT.value)
+        # Another worker's index, its TTL alone would keep the key for an hour
+        other_worker = ServiceKeyIndex(ttl=3600)
+        self.assertEqual(other_worker.get_service(service_key.secret_key), ServiceList.STUDENT.value)
+        self.assertNotIn(service_key.secret_key, other_worker._service_by_key_hash)
+
+        service_key.delete()
+        self.assertIsNone(other_worker.get_service(service_key.secret_key))
+
+
+class UserProfileSnapshotTests(TestCase):
+
+    def setUp(self):
+        service_key = ServiceKey.objects.create(secret_key='admin-service-test-key', service=ServiceList.ADMIN.value)
+        admin = CustomUser.objects.create_user(username='admin', password='admin-password', admin_type='student_admin')
+        self.student = StudentUser.objects.create(first_name='Test', last_name='Student',
+                                                  email='student@example.com')
+        self.client = APIClient(HTTP_X_API_KEY=service_key.secret_key)
+        self.client.force_authenticate(user=admin)
+
+    def test_admin_reads_the_student_profile(self):
+        response = self.client.get(reverse('user-detail', args=[self.student.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.student.id)
+        self.assertTrue(StudentProfileSnapshot.objects.filter(user=self.student).exists())
+
+    def test_non_numeric_id_is_not_found(self):
+        response = self.client.get(reverse('user-detail', args=['not-an-id']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeated_builds_keep_one_snapshot(self):
+        build_profile_snapshot(load_student_profile(self.student.id))
+        self.student.first_name = 'Renamed'
+        build_profile_snapshot(self.student)
+
+        self.assertEqual(StudentProfileSnapshot.objects.filter(user=self.student).count(), 1)
+        self.assertEqual(StudentProfileSnapshot.objects.get(user=self.student).data['first_name'], 'Renamed')
+
+
+class StudentProfileLoaderTests(TestCase):
+
+    def test_full_profile_is_loaded_in_a_fixed_number_of_queries(self):
+        student = StudentUser.objects.create(first_name='Test', last_name='Student', email='student@example.com')
+        for step in ('student_primary_info', 'student_education'):
+            StudentOnboardingStep.objects.create(user=student, step=step, is_completed=True)
+
+        # The student with its one-to-one relations, then one query per collection
+        with self.assertNumQueries(8):
+            profile = load_student_profile(student.id)
+            self.assertEqual(len(profile.student_onboarding_steps.all()), 2)
+            self.assertEqual(len(profile.student_documents.all()), 0)
+
+    def test_fields_limit_the_relations_loaded(self):
+        student = StudentUser.objects.create(first_name='Test', last_name='Student', email='student@example.com')
+        with self.assertNumQueries(2):
+            load_student_profile(student.id, fields=['passport', 'addresses'])
+
+
+class PrincipalCacheTests(TestCase):
+
+    def setUp(self):
+        self.student = StudentUser.objects.create(first_name='Test', last_name='Student', email='student@example.com',
+                                                  is_active=True)
+
+    def test_deactivating_a_user_invalidates_its_tokens_on_every_worker(self):
+        # Caches of two workers, neither is the one post_save evicts from, both see the bumped generation
+        this_worker, other_worker = PrincipalCache(max_size=10, max_ttl=300), PrincipalCache(max_size=10, max_ttl=300)
+        for worker in (this_worker, other_worker):
+            worker.set('student-token', self.student, 'student', {'sub': 'student'})
+            self.assertEqual(worker.get('student-token').user.pk, self.student.pk)
+
+        self.student.is_active = False
+        self.student.save()
+
+        self.assertIsNone(this_worker.get('student-token'))
+        self.assertIsNone(other_worker.get('student-token'))
+
+    def test_bumped_generation_invalidates_cached_tokens(self):
+        worker = PrincipalCache(max_size=10, max_ttl=300)
+        worker.set('student-token', self.student, 'student', {'sub': 'student'})
+
+        # Writes through update() send no post_save and bump the generation themselves
+        StudentUser.objects.filter(pk=self.student.pk).update(is_active=False)
+        principal_cache.bump_generation(StudentUser._meta.label_lower, self.student.pk)
+        self.assertIsNone(worker.get('student-token'))
+
+
+class DocumentStorageTestCase(TestCase):
+    """Runs against LocalDocumentStorage in a throwaway directory, as a student calling from the student service"""
+
+    def setUp(self):
+        self.storage_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_root, ignore_errors=True)
+
+        storage_settings = override_settings(
+            STUDENT_DOCUMENT_STORAGE='students.utility.document_storage.LocalDocumentStorage',
+            STUDENT_DOCUMENT_LOCAL_ROOT=self.storage_root,
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        get_document_storage.cache_clear()
+        self.addCleanup(get_document_storage.cache_clear)
+
+        service_key = ServiceKey.objects.create(secret_key='student-service-test-key',
+                                                service=ServiceList.STUDENT.value)
+        self.student = StudentUser.objects.create(first_name='Test', last_name='Student',
+                                                  email='student@example.com')
+        self.client = APIClient(HTTP_X_API_KEY=service_key.secret_key)
+        self.client.force_authenticate(user=self.student)
+
+
+class StudentDocumentUploadsTests(DocumentStorageTestCase):
+
+    def start_upload(self, content):
+        response = self.client.post(reverse('student_document_uploads-list'), {
+            'document_type': 'admission_letter',
+            'filename': 'admission.pdf',
+            'total_size': len(content),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put_range(self, upload_id, content, start, end):
+        return self.client.generic(
+            'PUT', reverse('student_document_uploads-detail', args=[upload_id]), content[start:end + 1],
+            content_type='application/octet-stream', HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(content)}',
+        )
+
+    def test_chunked_upload_is_finalized_into_a_document(self):
+        upload_id = self.start_upload(PDF_CONTENT)
+        middle = len(PDF_CONTENT) // 2
+
+        self.assertEqual(self.put_range(upload_id, PDF_CONTENT, 0, middle - 1).status_code, 200)
+        self.assertEqual(self.put_range(upload_id, PDF_CONTENT, middle, len(PDF_CONTENT) - 1).status_code, 200)
+
+        response = self.client.post(reverse('student_document_uploads-finalize', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+
+        document = StudentDocument.objects.get(user=self.student, document_type='admission_letter')
+        self.assertEqual(document.file_size, len(PDF_CONTENT))
+        self.assertEqual(len(document.content_hash), 64)
+        with get_document_storage().open(document.uploaded_file_name) as stored_file:
+            self.assertEqual(stored_file.read(), PDF_CONTENT)
+
+        upload = StudentDocumentUpload.objects.get(pk=upload_id)
+        self.assertEqual(upload.status, StudentDocumentUpload.STATUS_COMPLETED)
+        self.assertEqual(upload.document_id, document.id)
+
+        # A retried finalize returns the same document without storing the file again
+        response = self.client.post(reverse('student_document_uploads-finalize', args=[upload_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], document.id)
+        self.assertEqual(StudentDocument.objects.filter(user=self.student).count(), 1)
+
+    def test_out_of_order_range_reports_where_to_resume(self):
+        upload_id = self.start_upload(PDF_CONTENT)
+
+        response = self.put_range(upload_id, PDF_CONTENT, 100, 199)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received_bytes'], 0)
+
+    def test_incomplete_upload_is_not_finalized(self):
+        upload_id = self.start_upload(PDF_CONTENT)
+        self.assertEqual(self.put_range(upload_id, PDF_CONTENT, 0, 1023).status_code, 200)
+
+        response = self.client.post(reverse('student_document_uploads-finalize', args=[upload_id]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received_bytes'], 1024)
+        self.assertFalse(StudentDocument.objects.filter(user=self.student).exists())
+
+
+class SignedDocumentUploadTests(DocumentStorageTestCase):
+
+    def upload(self, content, content_type='application/pdf'):
+        response = self.client.post(reverse('student_document_uploads-signed'), {
+            'document_type': 'admission_letter',
+            'filename': 'admission.pdf',
+            'total_size': len(PDF_CONTENT),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        put = self.client.generic('PUT', response.data['upload_url'], content, content_type=content_type)
+        self.assertEqual(put.status_code, 200)
+        return self.client.post(reverse('student_document_uploads-signed-complete'),
+                                {'upload_token': response.data['upload_token']}, format='json')
+
+    def test_completed_upload_records_the_content_hash(self):
+        response = self.upload(PDF_CONTENT)
+        self.assertEqual(response.status_code, 200)
+
+        document = StudentDocument.objects.get(user=self.student, document_type='admission_letter')
+        self.assertEqual(document.content_hash, hashlib.sha256(PDF_CONTENT).hexdigest())
+
+    def test_resubmitted_content_keeps_the_stored_object(self):
+        self.upload(PDF_CONTENT)
+        first_file_name = StudentDocument.objects.get(user=self.student).uploaded_file_name
+
+        response = self.upload(PDF_CONTENT)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StudentDocument.objects.get(user=self.student).uploaded_file_name, first_file_name)
+        self.assertEqual(OrphanedDocumentObject.objects.get().reason, 'duplicate_upload')
+
+    def test_rejected_upload_is_purged_after_the_usual_delay(self):
+        response = self.upload(b'not a pdf' + PDF_CONTENT[9:])
+        self.assertEqual(response.status_code, 400)
+
+        orphan = OrphanedDocumentObject.objects.get()
+        self.assertEqual(orphan.reason, 'rejected_upload')
+        self.assertGreater(orphan.delete_after, timezone.now())
+
+
+class LocalDocumentUploadViewTests(DocumentStorageTestCase):
+    file_name = 'STUDENT/u1/admission_letter/admission.pdf'
+
+    def get_upload_url(self, content_type='application/pdf'):
+        return get_document_storage().generate_upload_url(self.file_name, content_type, timedelta(minutes=5))
+
+    def test_signed_put_stores_the_body(self):
+        response = self.client.generic('PUT', self.get_upload_url(), PDF_CONTENT, content_type='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        with get_document_storage().open(self.file_name) as stored_file:
+            self.assertEqual(stored_file.read(), PDF_CONTENT)
+
+    @override_settings(STUDENT_DOCUMENT_MAX_SIZE=1024)
+    def test_body_over_the_document_size_limit_is_refused(self):
+        response = self.client.generic('PUT', self.get_upload_url(), PDF_CONTENT, content_type='application/pdf')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(get_document_storage().exists(self.file_name))
+
+    def test_content_type_must_match_the_signature(self):
+        response = self.client.generic('PUT', self.get_upload_url(), PDF_CONTENT, content_type='image/png')
+        self.assertEqual(response.status_code, 403)
+
+    def test_tampered_token_is_refused(self):
+        tampered_url = self.get_upload_url().rstrip('/') + 'x/'
+        response = self.client.generic('PUT', tampered_url, PDF_CONTENT, content_type='application/pdf')
+        self.assertEqual(response.status_code, 403)
+
+
+class HashingUploadHandlerTests(DocumentStorageTestCase):
+
+    def post_file(self):
+        request = RequestFactory().post('/', {
+            'admission_letter': SimpleUploadedFile('admission.pdf', PDF_CONTENT, content_type='application/pdf'),
+        })
+        return request.FILES['admission_letter']
+
+    def test_file_kept_in_memory_is_hashed(self):
+        uploaded_file = self.post_file()
+        self.assertIsInstance(uploaded_file, InMemoryUploadedFile)
+        self.assertEqual(uploaded_file.content_hash, hashlib.sha256(PDF_CONTENT).hexdigest())
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_file_spooled_to_disk_is_hashed(self):
+        uploaded_file = self.post_file()
+        self.assertIsInstance(uploaded_file, TemporaryUploadedFile)
+        self.assertEqual(uploaded_file.content_hash, hashlib.sha256(PDF_CONTENT).hexdigest())
+
+    def test_multipart_upload_records_the_content_hash(self):
+        response = self.client.post(reverse('student_documents-list'), {
+            'admission_letter': SimpleUploadedFile('admission.pdf', PDF_CONTENT, content_type='application/pdf'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+        document = StudentDocument.objects.get(user=self.student, document_type='admission_letter')
+        self.assertEqual(document.content_hash, hashlib.sha256(PDF_CONTENT).hexdigest())
+
+
+class PurgeOrphanedObjectsTests(DocumentStorageTestCase):
+
+    def test_due_objects_are_deleted_and_live_ones_kept(self):
+        storage = get_document_storage()
+        orphan = storage.save('STUDENT/u1/admission_letter/old.pdf', ContentFile(PDF_CONTENT))
+        live = storage.save('STUDENT/u1/admission_letter/current.pdf', ContentFile(PDF_CONTENT))
+        StudentDocument.objects.create(user=self.student, document_type='admission_letter',
+                                       original_filename='current.pdf', uploaded_file_name=live)
+
+        enqueue_orphaned_objects([orphan, live], reason='superseded', delay=timedelta(0))
+        self.assertEqual(purge_orphaned_objects(), 2)
+
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(live))
+        self.assertFalse(OrphanedDocumentObject.objects.exists())
+
+    def test_objects_not_yet_due_are_left_alone(self):
+        storage = get_document_storage()
+        orphan = storage.save('STUDENT/u1/admission_letter/old.pdf', ContentFile(PDF_CONTENT))
+
+        enqueue_orphaned_objects([orphan], reason='superseded')
+        self.assertEqual(purge_orphaned_objects(), 0)
+        self.assertTrue(storage.exists(orphan))
+
+
+class DocumentIngestJobTests(DocumentStorageTestCase):
+
+    def test_job_whose_spool_is_missing_fails(self):
+        spool_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_root, ignore_errors=True)
+        job = StudentDocumentIngestJob.objects.create(user=self.student, files={'admission_letter': {
+            'original_filename': 'letter.pdf', 'file_size': len(PDF_CONTENT), 'content_hash': '',
+            'status': StudentDocumentIngestJob.FILE_PENDING, 'error': '', 'document': None,
+        }})
+
+        with override_settings(STUDENT_DOCUMENT_INGEST_SPOOL_DIR=spool_root):
+            StudentDocumentsViewSet.ingest_student_documents(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StudentDocumentIngestJob.STATUS_FAILED)
+        self.assertTrue(job.error)
+
+
+class PriyoPayMirrorTests(TestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.pages = {}
+        self.mirror = PriyoPayMirror(
+            'test_conversions', model=MirroredConversion, filterset_class=MirroredConversionFilterSet,
+            fetch=self.fetch, alternate_id_field='conversion_id', status_field='request_status',
+            supports_updated_since=True, supports_pages=True,
+        )
+
+    def fetch(self, params):
+        self.requests.append(params)
+        return self.pages[(params or {}).get('page', '1')], 200
+
+    @staticmethod
+    def conversion(pk, request_status='PENDING', updated_at='2026-01-01T00:00:00Z'):
+        return {'id': pk, 'student_id': 7, 'amount': '100.00', 'request_status': request_status,
+                'created_at': '2026-01-01T00:00:00Z', 'updated_at': updated_at}
+
+    def test_sync_follows_pages_then_resumes_from_cursor(self):
+        self.pages = {
+            '1': {'next': 'https://priyopay.test/api/conversions/?page=2', 'results': [self.conversion(1)]},
+            '2': {'next': None, 'results': [self.conversion(2, updated_at='2026-01-02T00:00:00Z')]},
+        }
+        self.assertEqual(self.mirror.sync(full=True), (2, 2))
+        self.assertEqual(self.requests, [None, {'page': '2'}])
+
+        cursor = PriyoPaySyncCursor.objects.get(name='test_conversions')
+        self.assertEqual(cursor.updated_since.isoformat(), '2026-01-02T00:00:00+00:00')
+
+        self.requests = []
+        self.pages = {'1': {'next': None, 'results': [self.conversion(2, 'APPROVED', '2026-01-03T00:00:00Z')]}}
+        self.assertEqual(self.mirror.sync(), (1, 1))
+        self.assertIn('updated_after', self.requests[0])
+        self.assertEqual(self.mirror.get_record(2).status, 'APPROVED')
+
+    def test_partial_sync_moves_no_cursor(self):
+        self.mirror.supports_pages = False
+        self.pages = {'1': {'next': 'https://priyopay.test/api/conversions/?page=2', 'results': [self.conversion(1)]}}
+        self.mirror.sync(full=True)
+        self.assertIsNone(PriyoPaySyncCursor.objects.get(name='test_conversions').last_synced_at)
+
+    def test_write_through_mirrors_created_and_updated_records(self):
+        created = self.conversion(5)
+        self.mirror.write_through(self.mirror.get_remote_id(created), {}, created)
+        self.assertEqual(self.mirror.get_record(5).status, 'PENDING')
+
+        # PriyoPay may answer a PATCH with only some fields, the stored payload keeps the rest
+        self.mirror.write_through(5, {'request_status': 'APPROVED'}, {'message': 'updated'})
+        record = self.mirror.get_record(5)
+        self.assertEqual(record.status, 'APPROVED')
+        self.assertEqual(record.payload['amount'], '100.00')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def open_breaker(self):
+        for _ in range(2):
+            self.breaker.record_failure(self.breaker.before_call())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_then_lets_one_trial_through_after_the_timeout(self):
+        self.open_breaker()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+        self.breaker.opened_at -= 30
+        trial = self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+        self.breaker.record_success(trial)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+
+    def test_failed_trial_reopens(self):
+        self.open_breaker()
+        self.breaker.opened_at -= 30
+        self.breaker.record_failure(self.breaker.before_call())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_stale_tickets_are_ignored(self):
+        straggler = self.breaker.before_call()
+        self.open_breaker()
+        self.breaker.opened_at -= 30
+        trial = self.breaker.before_call()
+
+        # A call admitted before the breaker opened neither closes it nor ends the trial
+        self.breaker.record_success(straggler)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.trial_in_flight)
+
+        self.breaker.record_failure(trial)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class GuardedPriyoPayClientTests(SimpleTestCase):
+
+    class FakeClient:
+        def fetch_conversions(self, params=None):
+            return {'results': []}, 503
+
+        def create_conversion(self, payload):
+            return {'id': 1}, 201
+
+    @override_settings(PRIYOPAY_BREAKER_FAILURE_THRESHOLD=1, PRIYOPAY_BREAKER_RESET_TIMEOUT=30)
+    @mock.patch.dict('students.utility.priyopay._guards', clear=True)
+    def test_only_reads_fail_fast(self):
+        client = GuardedPriyoPayClient(self.FakeClient())
+        client.fetch_conversions()
+        with self.assertRaises(UpstreamUnavailable):
+            client.fetch_conversions()
+        self.assertEqual(client.create_conversion(payload={}), ({'id': 1}, 201))
+
+
+class FxRateCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.fx_rates = FxRateCache(ttl=300, refresh_ahead=30, decimal_places=2, rate_field='rate',
+                                    amount_field='amount', converted_field='converted_amount')
+        self.payload = {'from_currency': 'BDT', 'to_currency': 'USD', 'for_subscription': False, 'amount': 1000}
+        cache.delete(self.fx_rates.get_key(self.fx_rates.get_pair(self.payload)))
+
+    def response(self, converted_amount):
+        return {'from_currency': 'BDT', 'to_currency': 'USD', 'for_subscription': False, 'amount': 1000,
+                'rate': 0.0082, 'converted_amount': converted_amount}
+
+    def test_rate_is_learned_when_converted_is_amount_times_rate(self):
+        self.assertIsNotNone(self.fx_rates.remember(self.payload, self.response(8.2), 200))
+
+        quote = self.fx_rates.quote({**self.payload, 'amount': 2500})
+        self.assertEqual(quote['converted_amount'], 20.5)
+        self.assertEqual(quote['rate'], 0.0082)
+
+    def test_rate_with_fees_is_not_learned(self):
+        self.assertIsNone(self.fx_rates.remember(self.payload, self.response(8.0), 200))
+        self.assertIsNone(self.fx_rates.quote(self.payload))
+
+    def test_failed_conversion_is_not_learned(self):
+        self.assertIsNone(self.fx_rates.remember(self.payload, self.response(8.2), 500))
+        self.assertIsNone(self.fx_rates.quote(self.payload))
+
+
+class PriyoPayListCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.fetches = []
+        self.results = [{'id': 1, 'claim_id': 'CLM-1'}]
+        self.lists = PriyoPayListCache('test_claims', fetch=self.fetch, id_fields=('id', 'claim_id'), ttl=60,
+                                       stale_ttl=300, miss_refresh_after=5, shared=False)
+        self.lists.invalidate()
+
+    def fetch(self, params):
+        self.fetches.append(params)
+        return {'results': list(self.results)}, 200
+
+    def test_items_are_served_from_one_fetch_until_invalidated(self):
+        self.assertEqual(self.lists.get_item(1), self.results[0])
+        self.assertEqual(self.lists.get_item('CLM-1'), self.results[0])
+        self.assertEqual(len(self.fetches), 1)
+
+        self.results.append({'id': 2, 'claim_id': 'CLM-2'})
+        self.lists.invalidate()
+        self.assertEqual(self.lists.get_item(2)['claim_id'], 'CLM-2')
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_lists_are_never_served_stale_without_a_shared_cache(self):
+        # invalidate() only reaches this worker, so an unshared entry must expire with its ttl
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.lists.refresh()
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], 60)
+
+
+class AsyncProxyViewTests(TestCase):
+
+    class ThreadNameView(APIView):
+        authentication_classes = []
+        permission_classes = [AllowAny]
+
+        def get(self, request, *args, **kwargs):
+            return Response({'thread': threading.current_thread().name})
+
+    def test_view_runs_on_the_proxy_executor(self):
+        view = async_proxy_view(self.ThreadNameView)
+        response = async_to_sync(view)(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['thread'].startswith('priyopay-proxy'))
+
+    async def test_async_middleware_refuses_unknown_services(self):
+        response = await self.async_client.get(reverse('priyopay_status'), HTTP_X_API_KEY='unknown-key')
+        self.assertEqual(response.status_code, 403)
@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 
 from students.views import DepositClaimsView, BDTtoUSDView, USDAccountsView, CurrencyConversionView, \
-    BDTUSDConversionView
+    BDTUSDConversionView, PriyoPayStatusView, async_proxy_view
 from students.viewsets import *
 
+if settings.PRIYOPAY_ASYNC_PROXY_VIEWS:
+    proxy_view = async_proxy_view
+else:
+    def proxy_view(view_class):
+        return view_class.as_view()
+
 router = DefaultRouter()
 
 # Register with exact endpoint names from old backend
@@ -16,6 +23,9 @@ router.register(r'financial-info', FinancialInfoViewSet, basename='financial_inf
 router.register(r'financer-info', FinancerInfoViewSet, basename='financer_info')
 
 router.register(r'student-documents', StudentDocumentsViewSet, basename='student_documents')
+router.register(r'student-document-uploads', StudentDocumentUploadsViewSet, basename='student_document_uploads')
+router.register(r'student-document-ingest-jobs', StudentDocumentIngestJobsViewSet,
+                basename='student_document_ingest_jobs')
 router.register(r'student-users', StudentUsersViewSet, basename='student_users')
 router.register(r'user', UserViewSet, basename='user')
 router.register(r'user-address', UserAddressViewSet, basename='user_address')
@@ -24,15 +34,17 @@ urlpatterns = [
     path('', include(router.urls)),
 
     path('onboarding/progress/', OnboardingProgressViewSet.as_view(), name='onboarding_progress'),
-    path('deposits/', DepositClaimsView.as_view(), name='deposits'),
-    path('deposits/<str:pk>/', DepositClaimsView.as_view(), name='deposit_detail'),  # ADD THIS
-    path('conversions/', BDTtoUSDView.as_view(), name='conversions'),
-    path('conversions/<str:pk>/', BDTtoUSDView.as_view(), name='conversion_detail'),
-    path('usd-accounts/', USDAccountsView.as_view(), name='usd_accounts'),
-    path('usd-accounts/<str:user_id>/', USDAccountsView.as_view(), name='usd_accounts_detail'),
-    path('convert-currency/', CurrencyConversionView.as_view(), name='convert_currency'),
-    path('bdt-usd-conversion/', BDTUSDConversionView.as_view(), name='bdt_usd_conversion'),
-    path('bdt-usd-conversion/<str:pk>/', BDTUSDConversionView.as_view(), name='bdt_usd_conversion_detail'),
+    path('local-document-uploads/<str:token>/', LocalDocumentUploadView.as_view(), name='local_document_upload'),
+    path('deposits/', proxy_view(DepositClaimsView), name='deposits'),
+    path('deposits/<str:pk>/', proxy_view(DepositClaimsView), name='deposit_detail'),  # ADD THIS
+    path('conversions/', proxy_view(BDTtoUSDView), name='conversions'),
+    path('conversions/<str:pk>/', proxy_view(BDTtoUSDView), name='conversion_detail'),
+    path('usd-accounts/', proxy_view(USDAccountsView), name='usd_accounts'),
+    path('usd-accounts/<str:user_id>/', proxy_view(USDAccountsView), name='usd_accounts_detail'),
+    path('convert-currency/', proxy_view(CurrencyConversionView), name='convert_currency'),
+    path('bdt-usd-conversion/', proxy_view(BDTUSDConversionView), name='bdt_usd_conversion'),
+    path('bdt-usd-conversion/<str:pk>/', proxy_view(BDTUSDConversionView), name='bdt_usd_conversion_detail'),
+    path('priyopay/status/', PriyoPayStatusView.as_view(), name='priyopay_status'),
 
     re_path(r'^onboarding/(?P<step>[\w-]+)/$', OnboardingViewSet.as_view(), name='onboarding_step'),
 ]
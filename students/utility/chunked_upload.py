@@ -0,0 +1,82 @@
+import re
+import hashlib
+import logging
+import tempfile
+
+from django.core.files import File
+
+from students.utility.document_helper import get_document_storage
+from students.validators import check_content_type, SNIFF_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the request per iteration, so a chunk is never held in memory whole
+STREAM_READ_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class IncompleteChunkError(Exception):
+    pass
+
+
+def parse_content_range(header):
+    """Content-Range: bytes {start}-{end}/{total} -> (start, end, total), None if missing or malformed"""
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        return None
+    return start, end, total
+
+
+def get_upload_part_name(upload, offset):
+    return f"STUDENT/u{upload.user_id}/_uploads/{upload.id}/{offset:010d}.part"
+
+
+def store_upload_chunk(upload, stream, offset, length):
+    """
+    Spool one byte range from the request stream to a temp file and save it as a part object
+    Returns the part's bucket path, raises IncompleteChunkError if the client sent fewer bytes than announced
+    and ValidationError if the first range does not start like the file type the upload claims
+    """
+    with tempfile.TemporaryFile() as spool:
+        remaining = length
+        while remaining:
+            data = stream.read(min(STREAM_READ_SIZE, remaining))
+            if not data:
+                break
+            spool.write(data)
+            remaining -= len(data)
+
+        if remaining:
+            raise IncompleteChunkError(f"Expected {length} bytes, received {length - remaining}")
+
+        if offset == 0:
+            # Spoofed files are turned away before anything reaches the bucket
+            spool.seek(0)
+            check_content_type(upload.original_filename, spool.read(SNIFF_SIZE))
+
+        spool.seek(0)
+        return get_document_storage().save(get_upload_part_name(upload, offset), File(spool))
+
+
+def assemble_upload(upload):
+    """
+    Concatenate the stored parts in offset order into a local temp file named after the original upload
+    The content is hashed on the way through, like a multipart upload
+    """
+    storage = get_document_storage()
+    assembled = tempfile.TemporaryFile()
+    digest = hashlib.sha256()
+    for part in upload.parts:
+        with storage.open(part['name']) as part_file:
+            for data in part_file.chunks():
+                assembled.write(data)
+                digest.update(data)
+    assembled.seek(0)
+
+    assembled_file = File(assembled, name=upload.original_filename)
+    assembled_file.content_hash = digest.hexdigest()
+    return assembled_file
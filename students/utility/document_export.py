@@ -0,0 +1,111 @@
+import os
+import re
+import logging
+import zipfile
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from students.utility.document_helper import get_document_storage
+
+logger = logging.getLogger(__name__)
+
+# Bounds concurrent bucket reads per process, shared by every export
+download_executor = ThreadPoolExecutor(max_workers=settings.GS_DOWNLOAD_MAX_WORKERS, thread_name_prefix='gs-download')
+
+# Fetched objects stay in memory up to this size and spill to disk beyond it
+EXPORT_SPOOL_MEMORY_SIZE = 1024 * 1024
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+class ZipStreamBuffer:
+    """Write-only, unseekable file for ZipFile, drained by the response generator after every write"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def fetch_document(file_name):
+    """Download one object to a spooled temp file, runs on the download pool"""
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MEMORY_SIZE)
+    try:
+        get_document_storage().download_to_file(file_name, spool)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def get_entry_name(document):
+    student = document.user
+    folder = re.sub('[^a-zA-Z0-9]', '_', f"{student.id}_{student.first_name or ''}_{student.last_name or ''}")
+    extension = os.path.splitext(document.uploaded_file_name)[1]
+    return f"{folder}/{document.document_type}{extension}"
+
+
+def stream_documents_zip(documents, prefetch=None):
+    """
+    Yield a ZIP archive of the documents' objects piece by piece
+    Up to prefetch objects are downloaded concurrently ahead of the one being written, so memory stays bounded
+    Objects that cannot be fetched are listed in errors.txt instead of failing the whole archive
+    """
+    prefetch = prefetch or settings.STUDENT_DOCUMENT_EXPORT_PREFETCH
+    documents = iter(documents)
+    pending = deque()
+    errors = []
+
+    def fetch_next():
+        document = next(documents, None)
+        if document is not None:
+            pending.append((document, download_executor.submit(fetch_document, document.uploaded_file_name)))
+
+    buffer = ZipStreamBuffer()
+    try:
+        with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for _ in range(prefetch):
+                fetch_next()
+
+            while pending:
+                document, future = pending.popleft()
+                fetch_next()
+
+                try:
+                    spool = future.result()
+                except Exception as ex:
+                    logger.error(f"Export fetch failed for {document.uploaded_file_name}: {ex}", exc_info=True)
+                    errors.append(f"{get_entry_name(document)}: {ex}")
+                    continue
+
+                entry = zipfile.ZipInfo(get_entry_name(document), date_time=document.updated_at.timetuple()[:6])
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                with spool, archive.open(entry, mode='w') as entry_file:
+                    for chunk in iter(lambda: spool.read(EXPORT_CHUNK_SIZE), b''):
+                        entry_file.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                yield buffer.drain()
+
+            if errors:
+                archive.writestr('errors.txt', '\n'.join(errors))
+        # Central directory, written when the archive closes
+        yield buffer.drain()
+    finally:
+        # Client went away mid-download, drop whatever is still queued
+        for _, future in pending:
+            future.cancel()
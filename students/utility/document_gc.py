@@ -0,0 +1,129 @@
+import uuid
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from students.models import OrphanedDocumentObject, StudentDocument, StudentDocumentUpload, StudentUser
+from students.utility.document_helper import get_document_storage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_orphaned_objects(file_names, reason, delay=None):
+    """
+    Record bucket objects that are no longer referenced, to be purged off the request path
+    Call it inside the transaction that drops the reference, so the queue and the rows never disagree
+    """
+    file_names = {file_name for file_name in file_names if file_name}
+    if not file_names:
+        return
+
+    delete_after = timezone.now() + (settings.DOCUMENT_GC_DELAY if delay is None else delay)
+    OrphanedDocumentObject.objects.bulk_create(
+        [OrphanedDocumentObject(file_name=file_name, reason=reason, delete_after=delete_after)
+         for file_name in file_names],
+        ignore_conflicts=True,
+    )
+
+
+def get_live_file_names(file_names):
+    """The subset of file_names a row still points at, deduplicated uploads can bring an object back to life"""
+    live = set(StudentDocument.objects.filter(uploaded_file_name__in=file_names)
+               .values_list('uploaded_file_name', flat=True))
+    live.update(StudentDocument.objects.filter(thumbnail_file_name__in=file_names)
+                .values_list('thumbnail_file_name', flat=True))
+
+    # Parts of resumable uploads still in progress, STUDENT/u{id}/_uploads/{upload id}/{offset}.part
+    upload_ids = set()
+    for file_name in file_names:
+        if '/_uploads/' in file_name:
+            try:
+                upload_ids.add(uuid.UUID(file_name.split('/_uploads/', 1)[1].split('/', 1)[0]))
+            except ValueError:
+                continue
+    if upload_ids:
+        for parts in StudentDocumentUpload.objects.filter(
+            id__in=upload_ids, status=StudentDocumentUpload.STATUS_IN_PROGRESS
+        ).values_list('parts', flat=True):
+            live.update(part['name'] for part in parts)
+    return live
+
+
+def purge_orphaned_objects(batch_size=None):
+    """
+    Delete one batch of due objects from the bucket, returns how many queue entries were processed
+    Rows are claimed with SKIP LOCKED in a short transaction that pushes delete_after out by DOCUMENT_GC_CLAIM_LEASE,
+    the bucket deletes run outside any transaction and the rows are settled in a second short one
+    """
+    batch_size = batch_size or settings.DOCUMENT_GC_BATCH_SIZE
+    lease_until = timezone.now() + settings.DOCUMENT_GC_CLAIM_LEASE
+    with transaction.atomic():
+        entries = list(
+            OrphanedDocumentObject.objects.select_for_update(skip_locked=True)
+            .filter(delete_after__lte=timezone.now())
+            .order_by('delete_after')
+            .values_list('id', 'file_name')[:batch_size]
+        )
+        if not entries:
+            return 0
+        OrphanedDocumentObject.objects.filter(id__in=[entry_id for entry_id, _ in entries]) \
+            .update(delete_after=lease_until)
+
+    live = get_live_file_names([file_name for _, file_name in entries])
+    to_delete = [file_name for _, file_name in entries if file_name not in live]
+    errors = get_document_storage().delete_many(to_delete) if to_delete else {}
+
+    with transaction.atomic():
+        # Only rows still under this purger's lease, a lapsed lease may have been claimed by another purger
+        claimed = OrphanedDocumentObject.objects.filter(delete_after=lease_until)
+        claimed.filter(id__in=[entry_id for entry_id, file_name in entries if file_name not in errors]).delete()
+        for file_name, error in errors.items():
+            logger.warning(f"Orphaned document purge failed for {file_name}: {error}")
+            claimed.filter(file_name=file_name).update(
+                attempts=F('attempts') + 1, last_error=error,
+                delete_after=timezone.now() + settings.DOCUMENT_GC_DELAY,
+            )
+    return len(entries)
+
+
+def reconcile_student_objects(student_id, grace=None):
+    """
+    Queue objects under STUDENT/u{id}/ that no row references and that are older than the grace period
+    Returns the orphaned paths found
+    """
+    grace = settings.DOCUMENT_GC_RECONCILE_GRACE if grace is None else grace
+    cutoff = timezone.now() - grace
+
+    live = set()
+    for uploaded_file_name, thumbnail_file_name in StudentDocument.objects.filter(
+        user_id=student_id
+    ).values_list('uploaded_file_name', 'thumbnail_file_name'):
+        live.update((uploaded_file_name, thumbnail_file_name))
+    for parts in StudentDocumentUpload.objects.filter(
+        user_id=student_id, status=StudentDocumentUpload.STATUS_IN_PROGRESS
+    ).values_list('parts', flat=True):
+        live.update(part['name'] for part in parts)
+
+    orphaned = [
+        file_name for file_name, modified_at in get_document_storage().list_objects(f"STUDENT/u{student_id}/")
+        if file_name not in live and modified_at and modified_at < cutoff
+    ]
+    enqueue_orphaned_objects(orphaned, reason='reconcile', delay=timedelta(0))
+    return orphaned
+
+
+def reconcile_bucket(student_ids=None, grace=None):
+    if student_ids is None:
+        student_ids = StudentUser.objects.values_list('id', flat=True).iterator()
+
+    orphaned = 0
+    for student_id in student_ids:
+        try:
+            orphaned += len(reconcile_student_objects(student_id, grace))
+        except Exception as ex:
+            logger.error(f"Bucket reconcile failed for student {student_id}: {ex}", exc_info=True)
+    return orphaned
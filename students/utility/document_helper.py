@@ -1,18 +1,32 @@
 import os
 import re
+import time
+import hashlib
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from django.conf import settings
 from django.core.cache import cache
-from storages.backends.gcloud import GoogleCloudStorage
+from django.utils.module_loading import import_string
 
 logger = logging.getLogger(__name__)
 
+# Bounds concurrent bucket writes per process, shared by every request
+upload_executor = ThreadPoolExecutor(max_workers=settings.GS_UPLOAD_MAX_WORKERS, thread_name_prefix='gs-upload')
+
+
+@lru_cache(maxsize=None)
+def get_document_storage():
+    """Bucket storage shared by the process, so the GCS client and credentials are built once"""
+    return import_string(settings.STUDENT_DOCUMENT_STORAGE)()
+
+
 def google_bucket_file_upload(the_file, file_name):
     """Upload file to GCP bucket - exact same as old backend"""
     try:
         error_msg = ""
-        GoogleCloudStorage().save(name=file_name, content=the_file)
+        get_document_storage().save(name=file_name, content=the_file)
         return file_name, error_msg  # ✅ ADD THIS LINE
 
     except Exception as ex:
@@ -22,33 +36,115 @@ def google_bucket_file_upload(the_file, file_name):
 
     return file_name, error_msg
 
+
+def google_bucket_files_upload(files, on_uploaded=None):
+    """
+    Upload several files concurrently on the shared upload pool
+    files maps a key to (file, bucket file name), returns key -> (bucket file name or None, error message)
+    on_uploaded(key, result) is called in the caller's thread as each upload finishes
+    """
+    futures = {
+        upload_executor.submit(google_bucket_file_upload, the_file, file_name): key
+        for key, (the_file, file_name) in files.items()
+    }
+    results = {}
+    for future in as_completed(futures):
+        key = futures[future]
+        results[key] = future.result()
+        if on_uploaded:
+            on_uploaded(key, results[key])
+    return results
+
+class DocumentUrlSigner:
+    """
+    Signed document URLs, cached as (url, expires_at) in the default cache so every worker shares them
+    A page resolves all of its URLs with one get_many and at most one set_many
+    Entries within refresh_ahead of expiring are signed again, so a returned URL is always valid for at least that long
+    """
+
+    key_prefix = 'gs_signed_url_'
+
+    def __init__(self, expiration, refresh_ahead):
+        self.expiration = expiration.total_seconds()
+        self.refresh_ahead = refresh_ahead.total_seconds()
+
+    def get_key(self, file_name):
+        return f"{self.key_prefix}{file_name}"
+
+    def sign(self, file_name):
+        """Signed locally by the shared storage from its loaded credentials, no API call"""
+        try:
+            return get_document_storage().url(file_name)
+        except Exception as ex:
+            logger.error(f"GCP URL error for {file_name}: {ex}", exc_info=True)
+            return None
+
+    def get_urls(self, file_names):
+        """file name -> signed URL, files that could not be signed are left out"""
+        keys = {self.get_key(file_name): file_name for file_name in set(file_names) if file_name}
+        if not keys:
+            return {}
+
+        now = time.time()
+        urls = {}
+        cached = cache.get_many(keys)
+        for key, file_name in keys.items():
+            entry = cached.get(key)
+            if entry and entry[1] - now > self.refresh_ahead:
+                urls[file_name] = entry[0]
+
+        signed = {}
+        for key, file_name in keys.items():
+            if file_name in urls:
+                continue
+            url = self.sign(file_name)
+            if url:
+                urls[file_name] = url
+                signed[key] = (url, now + self.expiration)
+
+        if signed:
+            cache.set_many(signed, timeout=self.expiration)
+        return urls
+
+    def get_url(self, file_name):
+        return self.get_urls([file_name]).get(file_name)
+
+
+document_url_signer = DocumentUrlSigner(expiration=settings.GS_EXPIRATION, refresh_ahead=settings.GS_URL_REFRESH_AHEAD)
+
+
 def google_bucket_file_url(file_name):
-    """Generate public URL - exact same as old backend"""
-    cache_key = f"gs_url_{file_name}"
-    cached_val = cache.get(cache_key)
-    if cached_val:
-        return cached_val
-    try:
-        ret = GoogleCloudStorage().url(file_name)
-        print(f"GCP URL generated: {ret}")  
-    except Exception as ex:
-        print(f"GCP URL error: {ex}")  
-        logger.error(str(ex), exc_info=True)
-        ret = None
-    cache.set(cache_key, ret, timeout=settings.GS_EXPIRATION.total_seconds())
-    return ret
+    """Signed URL for one file, prefer google_bucket_file_urls when rendering several"""
+    return document_url_signer.get_url(file_name)
+
+
+def google_bucket_file_urls(file_names):
+    """Signed URLs for many files in one cache round trip, returns file name -> URL"""
+    return document_url_signer.get_urls(file_names)
+
 
 def google_bucket_file_delete(file_name):
     """Delete file from GCP - exact same as old backend"""
     try:
-        return GoogleCloudStorage().delete(file_name)
+        return get_document_storage().delete(file_name)
     except Exception as ex:
         logger.error(str(ex), exc_info=True)
         return False
 
+def get_content_hash(the_file):
+    """SHA-256 of a file, taken from the upload handler when it was hashed while streaming in"""
+    content_hash = getattr(the_file, 'content_hash', None)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        for chunk in the_file.chunks():
+            digest.update(chunk)
+        the_file.seek(0)
+        content_hash = digest.hexdigest()
+    return content_hash
+
 def build_file_name(upload_file, bucket_folder_name, version_required=True):
-    """Build GCP file name - same logic as old backend"""
-    name, extension = os.path.splitext(upload_file.name)
+    """Build GCP file name - same logic as old backend, upload_file is a file or the client's file name"""
+    name, extension = os.path.splitext(getattr(upload_file, 'name', upload_file))
     bucket_file_name = re.sub('[^a-zA-Z0-9]', '_', name)
     max_char = getattr(settings, 'GS_BUCKET_FILE_NAME_MAX_CHAR', 50)
     if len(bucket_file_name) > max_char:
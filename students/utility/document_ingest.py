@@ -0,0 +1,101 @@
+import os
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.db import close_old_connections
+
+from students.models import StudentDocumentIngestJob
+from students.utility.document_helper import get_content_hash
+
+logger = logging.getLogger(__name__)
+
+# Runs deferred ingestion jobs, each job fans its files out on the shared upload pool
+ingest_executor = ThreadPoolExecutor(max_workers=settings.STUDENT_DOCUMENT_INGEST_MAX_WORKERS,
+                                     thread_name_prefix='document-ingest')
+
+
+def submit_ingest_job(ingest, job_id):
+    """
+    Run ingest(job_id) on ingest_executor
+    Pool threads outlive requests, so each job drops stale DB connections before and after like the request cycle does
+    """
+    def run():
+        close_old_connections()
+        try:
+            ingest(job_id)
+        except Exception as ex:
+            logger.error(f"Document ingest job {job_id} crashed: {ex}", exc_info=True)
+            fail_unfinished_job(job_id, str(ex))
+        finally:
+            close_old_connections()
+
+    return ingest_executor.submit(run)
+
+
+def fail_unfinished_job(job_id, error):
+    """Mark a job that crashed before finishing as failed, so its status endpoint does not report it running forever"""
+    try:
+        StudentDocumentIngestJob.objects.filter(
+            id=job_id,
+            status__in=[StudentDocumentIngestJob.STATUS_PENDING, StudentDocumentIngestJob.STATUS_PROCESSING],
+        ).update(status=StudentDocumentIngestJob.STATUS_FAILED, error=error)
+    except Exception as ex:
+        logger.error(f"Could not mark document ingest job {job_id} failed: {ex}", exc_info=True)
+    remove_spool(job_id)
+
+
+def get_spool_dir(job_id):
+    return os.path.join(settings.STUDENT_DOCUMENT_INGEST_SPOOL_DIR, str(job_id))
+
+
+def spool_files(job_id, files):
+    """
+    Copy validated uploads to the job's spool directory, returns the job's initial per-file progress
+    Uploads Django already wrote to a temp file are moved rather than copied
+    """
+    spool_dir = get_spool_dir(job_id)
+    os.makedirs(spool_dir, exist_ok=True)
+
+    progress = {}
+    for doc_type, uploaded_file in files.items():
+        content_hash = get_content_hash(uploaded_file)
+        spool_path = os.path.join(spool_dir, doc_type)
+        if hasattr(uploaded_file, 'temporary_file_path'):
+            file_move_safe(uploaded_file.temporary_file_path(), spool_path, allow_overwrite=True)
+        else:
+            with open(spool_path, 'wb') as spooled:
+                for chunk in uploaded_file.chunks():
+                    spooled.write(chunk)
+
+        progress[doc_type] = {
+            'original_filename': uploaded_file.name,
+            'file_size': uploaded_file.size,
+            'content_hash': content_hash,
+            'status': StudentDocumentIngestJob.FILE_PENDING,
+            'error': '',
+            'document': None,
+        }
+    return progress
+
+
+def open_spooled_files(job):
+    """document type -> File over the spooled copy, named and hashed like the original upload"""
+    files = {}
+    try:
+        for doc_type, info in job.files.items():
+            spooled = File(open(os.path.join(get_spool_dir(job.id), doc_type), 'rb'), name=info['original_filename'])
+            spooled.content_hash = info['content_hash']
+            files[doc_type] = spooled
+    except Exception:
+        for spooled in files.values():
+            spooled.close()
+        raise
+    return files
+
+
+def remove_spool(job_id):
+    shutil.rmtree(get_spool_dir(job_id), ignore_errors=True)
@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import mimetypes
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from google.cloud.exceptions import NotFound
+from storages.backends.gcloud import GoogleCloudStorage
+from storages.utils import clean_name
+
+LOCAL_UPLOAD_SALT = 'students.local-document-upload'
+# Most calls accepted in one GCS batch request
+BATCH_DELETE_SIZE = 100
+
+
+class GoogleCloudDocumentStorage(GoogleCloudStorage):
+    """Documents bucket, plus the signed uploads, object metadata, batch deletes and listings the document flows use"""
+
+    def generate_upload_url(self, name, content_type, expiration):
+        """V4 signed PUT URL, the client must send the same Content-Type header"""
+        blob = self.bucket.blob(self._normalize_name(clean_name(name)))
+        return blob.generate_signed_url(
+            version='v4',
+            method='PUT',
+            expiration=expiration,
+            content_type=content_type,
+            credentials=self.credentials,
+        )
+
+    def get_upload_metadata(self, name):
+        """{'size', 'content_type'} of a stored object, None if nothing was uploaded under the name"""
+        blob = self.bucket.get_blob(self._normalize_name(clean_name(name)))
+        if blob is None:
+            return None
+        return {'size': blob.size, 'content_type': blob.content_type}
+
+    def read_header(self, name, size):
+        """First size bytes of an object, fetched with a ranged download"""
+        blob = self.bucket.blob(self._normalize_name(clean_name(name)))
+        return blob.download_as_bytes(start=0, end=size - 1)
+
+    def download_to_file(self, name, file_obj):
+        """Stream an object into a local file object, without the full in-memory copy open() makes"""
+        self.bucket.blob(self._normalize_name(clean_name(name))).download_to_file(file_obj)
+
+    def delete_many(self, names):
+        """Delete objects in batched requests, returns name -> error for the ones that could not be deleted"""
+        errors = {}
+        for start in range(0, len(names), BATCH_DELETE_SIZE):
+            batch_names = names[start:start + BATCH_DELETE_SIZE]
+            try:
+                with self.client.batch():
+                    for name in batch_names:
+                        self.bucket.delete_blob(self._normalize_name(clean_name(name)))
+            except Exception:
+                # A batch fails as a whole, retry its objects one by one to find the culprits
+                for name in batch_names:
+                    try:
+                        self.bucket.delete_blob(self._normalize_name(clean_name(name)))
+                    except NotFound:
+                        pass
+                    except Exception as ex:
+                        errors[name] = str(ex)
+        return errors
+
+    def list_objects(self, prefix):
+        """(name, last modified) of every object under the prefix"""
+        for blob in self.bucket.list_blobs(prefix=self._normalize_name(clean_name(prefix))):
+            yield blob.name, blob.updated
+
+
+class LocalDocumentStorage(FileSystemStorage):
+    """
+    Filesystem stand-in for the documents bucket, for local runs and tests
+    Names are kept as given and overwritten like GoogleCloudStorage does, so stored paths match the bucket layout
+    Signed upload URLs point at LocalDocumentUploadView instead of the bucket
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', settings.STUDENT_DOCUMENT_LOCAL_ROOT)
+        kwargs.setdefault('base_url', settings.STUDENT_DOCUMENT_LOCAL_URL)
+        super().__init__(**kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        if self.exists(name):
+            self.delete(name)
+        return name
+
+    def generate_upload_url(self, name, content_type, expiration):
+        token = signing.dumps({
+            'name': name,
+            'content_type': content_type,
+            'expires_at': time.time() + expiration.total_seconds(),
+        }, salt=LOCAL_UPLOAD_SALT)
+        return reverse('local_document_upload', args=[token])
+
+    @staticmethod
+    def verify_upload_token(token):
+        """Claims of a local upload URL, raises signing.BadSignature if tampered with or expired"""
+        claims = signing.loads(token, salt=LOCAL_UPLOAD_SALT)
+        if time.time() > claims['expires_at']:
+            raise signing.SignatureExpired('Upload URL expired')
+        return claims
+
+    def get_upload_metadata(self, name):
+        if not self.exists(name):
+            return None
+        return {'size': self.size(name), 'content_type': mimetypes.guess_type(name)[0]}
+
+    def read_header(self, name, size):
+        with self.open(name) as stored_file:
+            return stored_file.read(size)
+
+    def download_to_file(self, name, file_obj):
+        with self.open(name) as stored_file:
+            shutil.copyfileobj(stored_file, file_obj)
+
+    def delete_many(self, names):
+        errors = {}
+        for name in names:
+            try:
+                self.delete(name)
+            except Exception as ex:
+                errors[name] = str(ex)
+        return errors
+
+    def list_objects(self, prefix):
+        root = self.path(prefix)
+        for directory, _, files in os.walk(root):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, self.location).replace(os.sep, '/')
+                yield name, self.get_modified_time(name)
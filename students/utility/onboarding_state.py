@@ -0,0 +1,49 @@
+from students.enums import StudentOnboardingSteps
+from students.models import StudentUser, StudentOnboardingStep
+from student_portal.principal_cache import principal_cache
+
+
+def compute_onboarding_state(completed_steps):
+    """Return (mask, last completed step, progress percentage) for a set of completed step names"""
+    expected_steps = StudentOnboardingSteps.values()
+    mask = 0
+    last_step = None
+    for step in expected_steps:
+        if step in completed_steps:
+            mask |= StudentOnboardingSteps.mask_bit(step)
+            last_step = step
+
+    completed_count = bin(mask).count('1')
+    progress = (completed_count / len(expected_steps) * 100) if expected_steps else 0
+    return mask, last_step, progress
+
+
+def sync_onboarding_state(student_id):
+    """Recompute the denormalized onboarding columns of one student from its StudentOnboardingStep rows"""
+    completed_steps = set(
+        StudentOnboardingStep.objects.filter(user_id=student_id, is_completed=True).values_list('step', flat=True)
+    )
+    mask, last_step, progress = compute_onboarding_state(completed_steps)
+    StudentUser.objects.filter(pk=student_id).update(
+        onboarding_steps_mask=mask,
+        last_onboarding_step=last_step,
+        onboarding_progress=progress,
+    )
+    # update() sends no post_save, cached principals would keep the old columns
+    principal_cache.bump_generation(StudentUser._meta.label_lower, student_id)
+    return mask, last_step, progress
+
+
+def backfill_onboarding_state(using=None):
+    """
+    Compute the columns of students that have completed steps but an empty mask, i.e. never synced
+    Idempotent and cheap once done, returns how many students were synced
+    """
+    student_ids = StudentUser.objects.using(using).filter(
+        onboarding_steps_mask=0, student_onboarding_steps__is_completed=True
+    ).values_list('id', flat=True).distinct()
+    synced = 0
+    for student_id in student_ids.iterator():
+        sync_onboarding_state(student_id)
+        synced += 1
+    return synced
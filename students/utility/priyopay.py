@@ -0,0 +1,407 @@
+import time
+import logging
+import threading
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api_clients.priyopay_client import PriyoPayClient
+from utilities.circuit_breaker import Guard, UpstreamUnavailable
+from utilities.http_client import attach_http_client
+from utilities.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Stale list caches are refreshed here, off the request that noticed
+refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='priyopay-refresh')
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(operation):
+    """Breaker and bulkhead of one PriyoPay operation (client method), created on first use"""
+    guard = _guards.get(operation)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(operation, Guard(
+                f"priyopay.{operation}",
+                failure_threshold=settings.PRIYOPAY_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.PRIYOPAY_BREAKER_RESET_TIMEOUT,
+                # Past the pool size calls would only queue for a connection inside urllib3
+                max_calls=settings.PRIYOPAY_BULKHEAD_MAX_CALLS or settings.OUTBOUND_HTTP_POOL_MAXSIZE,
+                max_wait=settings.PRIYOPAY_BULKHEAD_MAX_WAIT,
+            ))
+    return guard
+
+
+def get_guard_statuses():
+    return [guard.get_status() for guard in list(_guards.values())]
+
+
+def is_failed_response(result):
+    """Client methods return (response, status_code), upstream 5xx count against the breaker like exceptions do"""
+    try:
+        return int(result[1]) >= 500
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+# Reads that fail fast while PriyoPay is down, creates and updates move money and always go through
+GUARDED_METHODS = frozenset({
+    'fetch_deposit_claims',
+    'fetch_conversions',
+    'fetch_bdt_usd_conversions',
+    'fetch_usd_accounts',
+    'fetch_usd_account_by_id',
+    'convert_currency',
+})
+
+
+class GuardedPriyoPayClient:
+    """PriyoPayClient whose read methods each run inside their own breaker and bulkhead"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in GUARDED_METHODS or not callable(attr):
+            return attr
+
+        def guarded(*args, **kwargs):
+            return get_guard(name).call(attr, *args, is_failure=is_failed_response, **kwargs)
+        return guarded
+
+
+@lru_cache(maxsize=None)
+def get_priyopay_client():
+    """One PriyoPayClient per process on the pooled keep-alive session, instead of a new client per request"""
+    return GuardedPriyoPayClient(attach_http_client(PriyoPayClient(), 'priyopay'))
+
+
+priyopay_flights = SingleFlight()
+
+
+def get_flight_key(endpoint, params, scope):
+    params_key = '&'.join(f"{key}={value}" for key, value in sorted((params or {}).items()) if value not in (None, ''))
+    return f"{endpoint}|{params_key}|{scope or ''}"
+
+
+def coalesced_fetch(endpoint, fetch, params=None, scope=None):
+    """
+    Run a PriyoPay GET once for every identical request in flight, keyed by (endpoint, params, caller scope)
+    Callers share the returned (response, status) and must not mutate it
+    """
+    flight_key = get_flight_key(endpoint, params, scope)
+    if settings.PRIYOPAY_COALESCE_ACROSS_WORKERS:
+        return priyopay_flights.do(flight_key, _fetch_across_workers, flight_key, fetch, params)
+    return priyopay_flights.do(flight_key, fetch, params)
+
+
+def _fetch_across_workers(flight_key, fetch, params):
+    """
+    One worker takes the lock with cache.add and publishes its result for PRIYOPAY_COALESCE_RESULT_TTL
+    The others poll for it, and fetch on their own if the holder fails or takes longer than PRIYOPAY_COALESCE_WAIT
+    """
+    lock_key = f"priyopay_flight_lock_{flight_key}"
+    result_key = f"priyopay_flight_result_{flight_key}"
+
+    if cache.add(lock_key, 1, timeout=settings.PRIYOPAY_COALESCE_WAIT):
+        try:
+            result = fetch(params)
+            cache.set(result_key, result, timeout=settings.PRIYOPAY_COALESCE_RESULT_TTL)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.time() + settings.PRIYOPAY_COALESCE_WAIT
+    while time.time() < deadline:
+        result = cache.get(result_key)
+        if result is not None:
+            return result
+        if cache.get(lock_key) is None:
+            break
+        time.sleep(0.05)
+    return cache.get(result_key) or fetch(params)
+
+
+class PriyoPayListCache:
+    """
+    Last fetched PriyoPay list, kept in the default cache with an index of every id field -> position in results
+    Fresh for ttl, then served stale for up to stale_ttl while one worker refetches it in the background
+    invalidate() bumps a generation number, so every cached params variant is dropped at once
+    Without a shared cache the bump only reaches this worker, so lists are never served stale there
+    """
+
+    def __init__(self, name, fetch, id_fields, ttl, stale_ttl, miss_refresh_after, shared=True):
+        self.name = name
+        self.fetch = fetch
+        self.id_fields = id_fields
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl if shared else 0
+        self.miss_refresh_after = miss_refresh_after
+
+    @property
+    def generation_key(self):
+        return f"priyopay_list_{self.name}_generation"
+
+    def get_key(self, params):
+        generation = cache.get_or_set(self.generation_key, 1, timeout=None)
+        params_key = '&'.join(f"{key}={value}" for key, value in sorted((params or {}).items()))
+        return f"priyopay_list_{self.name}_{generation}_{params_key}"
+
+    def build_entry(self, response):
+        index = {}
+        for position, item in enumerate(response['results']):
+            for field in self.id_fields:
+                if item.get(field) is not None:
+                    index.setdefault(str(item[field]), position)
+        return {'response': response, 'index': index, 'fetched_at': time.time()}
+
+    def refresh(self, params=None):
+        """
+        Fetch the list from PriyoPay and cache it if it came back with results, returns the response
+        While PriyoPay is refused by its breaker or bulkhead, the last cached list is returned instead
+        """
+        key = self.get_key(params)
+        try:
+            # The cache is shared by every caller, so are the fetches
+            response, _ = coalesced_fetch(f"list:{self.name}", self.fetch, params)
+        except UpstreamUnavailable:
+            stale = cache.get(key)
+            if stale is None:
+                raise
+            logger.warning(f"PriyoPay unavailable, serving {self.name} fetched at {stale['fetched_at']}")
+            return stale['response']
+        if response and isinstance(response.get('results'), list):
+            cache.set(key, self.build_entry(response), timeout=self.ttl + self.stale_ttl)
+        return response
+
+    def refresh_in_background(self, params):
+        # cache.add is atomic, only the first worker to see the stale entry refetches it
+        if not cache.add(f"{self.get_key(params)}_refreshing", 1, timeout=self.ttl):
+            return
+        refresh_executor.submit(self._background_refresh, params)
+
+    def _background_refresh(self, params):
+        try:
+            self.refresh(params)
+        except Exception as ex:
+            logger.warning(f"Background refresh of PriyoPay {self.name} failed: {ex}")
+        finally:
+            cache.delete(f"{self.get_key(params)}_refreshing")
+
+    def get_entry(self, params=None):
+        entry = cache.get(self.get_key(params))
+        if entry is None:
+            self.refresh(params)
+            return cache.get(self.get_key(params))
+        if time.time() - entry['fetched_at'] > self.ttl:
+            self.refresh_in_background(params)
+        return entry
+
+    def get_item(self, pk, params=None):
+        """Item whose id field matches pk, None if PriyoPay does not have it"""
+        entry = self.get_entry(params)
+        if entry is not None and str(pk) in entry['index']:
+            return entry['response']['results'][entry['index'][str(pk)]]
+
+        # Items created since the last fetch are not indexed yet, look again unless the list is brand new
+        if entry is None or time.time() - entry['fetched_at'] < self.miss_refresh_after:
+            return None
+        self.refresh(params)
+        entry = cache.get(self.get_key(params))
+        if entry is not None and str(pk) in entry['index']:
+            return entry['response']['results'][entry['index'][str(pk)]]
+        return None
+
+    def invalidate(self):
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, 1, timeout=None)
+
+
+deposit_claims_cache = PriyoPayListCache(
+    'deposit_claims',
+    fetch=lambda params: get_priyopay_client().fetch_deposit_claims(),
+    id_fields=('id', 'claim_id'),
+    ttl=settings.PRIYOPAY_LIST_CACHE_TTL,
+    stale_ttl=settings.PRIYOPAY_LIST_CACHE_STALE_TTL,
+    miss_refresh_after=settings.PRIYOPAY_LIST_CACHE_MISS_REFRESH_AFTER,
+    shared=settings.CACHE_IS_SHARED,
+)
+
+conversions_cache = PriyoPayListCache(
+    'conversions',
+    fetch=lambda params: get_priyopay_client().fetch_conversions(params=params),
+    id_fields=('id', 'conversion_id'),
+    ttl=settings.PRIYOPAY_LIST_CACHE_TTL,
+    stale_ttl=settings.PRIYOPAY_LIST_CACHE_STALE_TTL,
+    miss_refresh_after=settings.PRIYOPAY_LIST_CACHE_MISS_REFRESH_AFTER,
+    shared=settings.CACHE_IS_SHARED,
+)
+
+bdt_usd_conversions_cache = PriyoPayListCache(
+    'bdt_usd_conversions',
+    fetch=lambda params: get_priyopay_client().fetch_bdt_usd_conversions(),
+    id_fields=('id',),
+    ttl=settings.PRIYOPAY_LIST_CACHE_TTL,
+    stale_ttl=settings.PRIYOPAY_LIST_CACHE_STALE_TTL,
+    miss_refresh_after=settings.PRIYOPAY_LIST_CACHE_MISS_REFRESH_AFTER,
+    shared=settings.CACHE_IS_SHARED,
+)
+
+
+class FxRateCache:
+    """
+    PriyoPay conversion rates by (from_currency, to_currency, for_subscription), quotes are computed locally from them
+    A rate is only learned from an upstream response with an explicit rate field whose converted amount is exactly
+    amount * rate, pairs quoted with fees or anything else amount-dependent are always forwarded
+    Rates are kept per process and in the default cache for ttl, and refetched in the background refresh_ahead before
+    they expire, an expired rate is never used
+    """
+
+    # Echoed from the upstream response, the amount, rate and converted amount are the only other fields of a quote
+    PAIR_FIELDS = ('from_currency', 'to_currency', 'for_subscription')
+
+    def __init__(self, ttl, refresh_ahead, decimal_places, rate_field, amount_field, converted_field):
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.quantum = Decimal(1).scaleb(-decimal_places)
+        self.rate_field = rate_field
+        self.amount_field = amount_field
+        self.converted_field = converted_field
+        self._local = {}
+
+    @staticmethod
+    def get_pair(payload):
+        """(from, to, for_subscription) of a conversion payload, None if it names no currencies"""
+        from_currency = str(payload.get('from_currency') or '').upper()
+        to_currency = str(payload.get('to_currency') or '').upper()
+        if not from_currency or not to_currency:
+            return None
+        for_subscription = str(payload.get('for_subscription', False)).lower() in ('1', 'true', 'yes')
+        return from_currency, to_currency, for_subscription
+
+    @staticmethod
+    def get_amount(payload):
+        """Requested amount as a Decimal, None if it is missing, negative or not a number"""
+        try:
+            amount = Decimal(str(payload.get('amount')))
+        except InvalidOperation:
+            return None
+        if not amount.is_finite() or amount < 0:
+            return None
+        return amount
+
+    @staticmethod
+    def get_key(pair):
+        return f"priyopay_fx_rate_{pair[0]}_{pair[1]}_{int(pair[2])}"
+
+    def convert(self, amount, rate):
+        return (amount * rate).quantize(self.quantum, rounding=ROUND_HALF_UP)
+
+    def remember(self, payload, response, status_code):
+        """
+        Learn the pair's rate from a PriyoPay conversion response, returns the cache entry or None if it has no
+        usable rate
+        """
+        pair = self.get_pair(payload)
+        amount = self.get_amount(payload)
+        if pair is None or amount is None or status_code != 200 or not isinstance(response, dict):
+            return None
+        try:
+            rate = Decimal(str(response[self.rate_field]))
+            converted = Decimal(str(response[self.converted_field]))
+        except (KeyError, InvalidOperation):
+            return None
+        if not rate.is_finite() or self.convert(amount, rate) != converted.quantize(self.quantum, ROUND_HALF_UP):
+            # Fees or rounding PriyoPay applies on top of the rate, a local quote would not match
+            logger.info(f"PriyoPay conversion for {pair} is not amount * rate, quotes are forwarded")
+            return None
+
+        template = {field: response[field] for field in self.PAIR_FIELDS if field in response}
+        types = {field: type(response[field]).__name__
+                 for field in (self.amount_field, self.rate_field, self.converted_field) if field in response}
+        entry = {'rate': str(rate), 'amount': str(amount), 'template': template, 'types': types,
+                 'fetched_at': time.time()}
+        cache.set(self.get_key(pair), entry, timeout=self.ttl)
+        self._local[pair] = entry
+        return entry
+
+    def fetch(self, pair, amount):
+        payload = {'from_currency': pair[0], 'to_currency': pair[1], 'for_subscription': pair[2], 'amount': amount}
+        response, status_code = get_priyopay_client().convert_currency(payload=payload)
+        return self.remember(payload, response, status_code)
+
+    def refresh_in_background(self, pair, amount):
+        if not cache.add(f"{self.get_key(pair)}_refreshing", 1, timeout=self.refresh_ahead):
+            return
+        refresh_executor.submit(self._background_refresh, pair, amount)
+
+    def _background_refresh(self, pair, amount):
+        try:
+            self.fetch(pair, amount)
+        except Exception as ex:
+            logger.warning(f"Background refresh of PriyoPay rate {pair} failed: {ex}")
+
+    def get_rate(self, pair):
+        """Cached entry for the pair, None once it expired, refreshed in the background when it is about to"""
+        now = time.time()
+        entry = self._local.get(pair)
+        if entry is None or now - entry['fetched_at'] >= self.ttl:
+            entry = cache.get(self.get_key(pair))
+            if entry is not None:
+                self._local[pair] = entry
+        if entry is None or now - entry['fetched_at'] >= self.ttl:
+            return None
+        if now - entry['fetched_at'] >= self.ttl - self.refresh_ahead:
+            self.refresh_in_background(pair, entry['amount'])
+        return entry
+
+    @staticmethod
+    def as_upstream_type(value, type_name):
+        """A Decimal in the JSON type PriyoPay used for the field, DRF would render a Decimal as a string"""
+        if type_name == 'str':
+            return str(value)
+        if type_name == 'int' and value == value.to_integral_value():
+            return int(value)
+        return float(value)
+
+    def quote(self, payload):
+        """
+        Conversion response for the payload computed from the cached rate, the pair fields, amount, rate and
+        converted amount in the types PriyoPay returns them
+        None when it cannot be quoted locally, the caller then forwards the payload and remember()s the response
+        """
+        pair = self.get_pair(payload)
+        amount = self.get_amount(payload)
+        if pair is None or amount is None:
+            return None
+
+        entry = self.get_rate(pair)
+        if entry is None:
+            return None
+
+        rate = Decimal(entry['rate'])
+        quote = dict(entry['template'])
+        for field, value in ((self.amount_field, amount), (self.rate_field, rate),
+                             (self.converted_field, self.convert(amount, rate))):
+            quote[field] = self.as_upstream_type(value, entry['types'].get(field))
+        return quote
+
+
+fx_rate_cache = FxRateCache(
+    ttl=settings.PRIYOPAY_FX_RATE_TTL,
+    refresh_ahead=settings.PRIYOPAY_FX_REFRESH_AHEAD,
+    decimal_places=settings.PRIYOPAY_FX_DECIMAL_PLACES,
+    rate_field=settings.PRIYOPAY_FX_RATE_FIELD,
+    amount_field=settings.PRIYOPAY_FX_AMOUNT_FIELD,
+    converted_field=settings.PRIYOPAY_FX_CONVERTED_FIELD,
+)
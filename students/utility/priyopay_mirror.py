@@ -0,0 +1,219 @@
+import logging
+from urllib.parse import urlsplit, parse_qsl
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from students.filters import MirroredDepositClaimFilterSet, MirroredConversionFilterSet, \
+    MirroredBdtUsdConversionFilterSet
+from students.models import MirroredDepositClaim, MirroredConversion, MirroredBdtUsdConversion, PriyoPaySyncCursor
+from students.utility.priyopay import get_priyopay_client
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 500
+UPDATE_FIELDS = ['alternate_id', 'student_id', 'status', 'amount', 'remote_created_at', 'remote_updated_at',
+                 'payload', 'updated_at']
+
+
+def parse_remote_datetime(value):
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(str(value))
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def parse_remote_decimal(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+class PriyoPayMirror:
+    """
+    Local mirror of one PriyoPay list, records are upserted by id and only rewritten when their payload changed
+    Lists that accept an updated-since filter are synced incrementally from the cursor, the others are refetched whole
+    """
+
+    def __init__(self, name, model, filterset_class, fetch, alternate_id_field, status_field,
+                 supports_updated_since, supports_pages):
+        self.name = name
+        self.model = model
+        self.filterset_class = filterset_class
+        self.fetch = fetch
+        self.alternate_id_field = alternate_id_field
+        self.status_field = status_field
+        self.supports_updated_since = supports_updated_since
+        # Whether fetch passes params on, following the next links of a paginated list needs it
+        self.supports_pages = supports_pages
+
+    def get_remote_id(self, item):
+        """Id PriyoPay gave a record, None if the response carries none"""
+        columns = self.extract(item)
+        return columns['remote_id'] if columns else None
+
+    def extract(self, item):
+        """Model columns of a PriyoPay record, None if it has no id"""
+        if not isinstance(item, dict):
+            return None
+        alternate_id = item.get(self.alternate_id_field) if self.alternate_id_field else None
+        remote_id = item.get('id') if item.get('id') is not None else alternate_id
+        if remote_id is None:
+            return None
+        return {
+            'remote_id': str(remote_id),
+            'alternate_id': str(alternate_id) if alternate_id is not None else None,
+            'student_id': str(item['student_id']) if item.get('student_id') is not None else None,
+            'status': item.get(self.status_field),
+            'amount': parse_remote_decimal(item.get('amount')),
+            'remote_created_at': parse_remote_datetime(item.get('created_at')),
+            'remote_updated_at': parse_remote_datetime(item.get('updated_at')),
+            'payload': item,
+        }
+
+    def upsert(self, items):
+        """Insert new records and rewrite changed ones, returns how many were written"""
+        rows = {}
+        for item in items:
+            columns = self.extract(item)
+            if columns:
+                rows[columns['remote_id']] = columns
+
+        written = 0
+        remote_ids = list(rows)
+        for start in range(0, len(remote_ids), UPSERT_BATCH_SIZE):
+            batch_ids = remote_ids[start:start + UPSERT_BATCH_SIZE]
+            stored = dict(self.model.objects.filter(remote_id__in=batch_ids).values_list('remote_id', 'payload'))
+            changed = [self.model(**rows[remote_id]) for remote_id in batch_ids
+                       if stored.get(remote_id) != rows[remote_id]['payload']]
+            if changed:
+                self.model.objects.bulk_create(changed, update_conflicts=True, unique_fields=['remote_id'],
+                                               update_fields=UPDATE_FIELDS)
+                written += len(changed)
+        return written
+
+    def sync(self, full=False, prune=False):
+        """
+        Pull records changed since the cursor (everything if full) and upsert them, returns (fetched, written)
+        prune deletes local records missing from a full fetch, and is skipped unless every page was read
+        A partial sync moves no cursor, so the mirror is not served from until a sync reads the whole list
+        """
+        cursor, _ = PriyoPaySyncCursor.objects.get_or_create(name=self.name)
+        started_at = timezone.now()
+
+        params = None
+        incremental = self.supports_updated_since and not full and cursor.updated_since
+        if incremental:
+            since = cursor.updated_since - timedelta(seconds=settings.PRIYOPAY_MIRROR_CURSOR_OVERLAP)
+            params = {settings.PRIYOPAY_MIRROR_UPDATED_SINCE_PARAM: since.isoformat()}
+
+        fetched = written = 0
+        remote_ids = set()
+        page_params = params
+        while True:
+            response, status_code = self.fetch(page_params)
+            if status_code != 200 or not isinstance(response, dict) or not isinstance(response.get('results'), list):
+                raise RuntimeError(f"PriyoPay {self.name} sync failed with {status_code}")
+
+            items = response['results']
+            fetched += len(items)
+            written += self.upsert(items)
+            remote_ids.update(columns['remote_id'] for columns in map(self.extract, items) if columns)
+
+            # Pages are followed through the next link's query params, fetch must pass them on
+            next_url = response.get('next')
+            if not next_url:
+                break
+            next_params = dict(parse_qsl(urlsplit(next_url).query))
+            if not self.supports_pages or next_params == page_params:
+                logger.warning(f"PriyoPay {self.name} has pages the mirror cannot fetch, the sync is partial")
+                return fetched, written
+            page_params = next_params
+
+        if prune and not incremental:
+            pruned, _ = self.model.objects.exclude(remote_id__in=remote_ids).delete()
+            logger.info(f"Pruned {pruned} {self.name} records missing from PriyoPay")
+
+        cursor.updated_since = self.model.objects.aggregate(newest=Max('remote_updated_at'))['newest']
+        cursor.last_synced_at = started_at
+        if not incremental:
+            cursor.last_full_sync_at = started_at
+        cursor.save()
+        return fetched, written
+
+    def write_through(self, pk, changes, response=None):
+        """
+        Apply a change PriyoPay accepted, a returned record is merged into the stored one
+        since PriyoPay may answer with only some of its fields
+        """
+        columns = self.extract(response)
+        lookup = columns['remote_id'] if columns else pk
+        record = self.get_record(lookup) if lookup else None
+        stored = record.payload if record is not None else {}
+        if columns:
+            self.upsert([{**stored, **changes, **response}])
+        elif record is not None:
+            self.upsert([{**stored, **changes}])
+
+    def get_record(self, pk, student_id=None):
+        records = self.model.objects.filter(Q(remote_id=str(pk)) | Q(alternate_id=str(pk)))
+        if student_id:
+            records = records.filter(student_id=str(student_id))
+        return records.first()
+
+    def is_ready(self):
+        """Whether reads can be served locally, the mirror must have synced within PRIYOPAY_MIRROR_MAX_LAG"""
+        if not settings.PRIYOPAY_MIRROR_READS:
+            return False
+        cursor = PriyoPaySyncCursor.objects.filter(name=self.name).only('last_synced_at').first()
+        return bool(cursor and cursor.last_synced_at and
+                    timezone.now() - cursor.last_synced_at <= timedelta(seconds=settings.PRIYOPAY_MIRROR_MAX_LAG))
+
+
+deposit_claims_mirror = PriyoPayMirror(
+    'deposit_claims',
+    model=MirroredDepositClaim,
+    filterset_class=MirroredDepositClaimFilterSet,
+    fetch=lambda params: get_priyopay_client().fetch_deposit_claims(),
+    alternate_id_field='claim_id',
+    status_field='claim_status',
+    supports_updated_since=False,
+    supports_pages=False,
+)
+
+conversions_mirror = PriyoPayMirror(
+    'conversions',
+    model=MirroredConversion,
+    filterset_class=MirroredConversionFilterSet,
+    fetch=lambda params: get_priyopay_client().fetch_conversions(params=params),
+    alternate_id_field='conversion_id',
+    status_field='request_status',
+    supports_updated_since=True,
+    supports_pages=True,
+)
+
+bdt_usd_conversions_mirror = PriyoPayMirror(
+    'bdt_usd_conversions',
+    model=MirroredBdtUsdConversion,
+    filterset_class=MirroredBdtUsdConversionFilterSet,
+    fetch=lambda params: get_priyopay_client().fetch_bdt_usd_conversions(),
+    alternate_id_field=None,
+    status_field='request_status',
+    supports_updated_since=False,
+    supports_pages=False,
+)
+
+priyopay_mirrors = {mirror.name: mirror for mirror in
+                    (deposit_claims_mirror, conversions_mirror, bdt_usd_conversions_mirror)}
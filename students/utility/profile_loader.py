@@ -0,0 +1,91 @@
+from django.db.models import JSONField, OuterRef, Subquery
+from django.db.models.functions import JSONObject
+
+from students.models import StudentUser, StudentEducation, StudentForeignUniversity, StudentDocument
+
+# One-to-one relations joined into the main query, approved_by is only rendered as its id and needs no join
+PROFILE_SELECT_RELATED = ('student_financial_info', 'student_passport')
+
+# Reverse foreign keys, a join would repeat the student row per child, so one query each however many rows
+# A full profile is therefore 1 + 7 queries
+PROFILE_PREFETCH_RELATED = (
+    'student_addresses',
+    'student_educations',
+    'student_job_experiences',
+    'student_foreign_universities',
+    'student_financer_info',
+    'student_documents',
+    'student_onboarding_steps',
+)
+
+# Relation each derived StudentCompleteProfileSerializer field reads from
+PROFILE_FIELD_RELATIONS = {
+    'addresses': 'student_addresses',
+    'educations': 'student_educations',
+    'university': 'student_educations',
+    'department': 'student_educations',
+    'experiences': 'student_job_experiences',
+    'universities': 'student_foreign_universities',
+    'financial_info': 'student_financial_info',
+    'financer_info': 'student_financer_info',
+    'passport': 'student_passport',
+    'documents': 'student_documents',
+    'profile_image_icon': 'student_documents',
+    'onboarding_progress': 'student_onboarding_steps',
+}
+
+
+def get_student_profile_queryset(queryset=None, fields=None):
+    """
+    StudentUser queryset carrying everything StudentCompleteProfileSerializer reads
+    Pass fields to load only the relations those serializer fields need
+    """
+    if queryset is None:
+        queryset = StudentUser.objects.all()
+
+    select_related, prefetch_related = PROFILE_SELECT_RELATED, PROFILE_PREFETCH_RELATED
+    if fields is not None:
+        relations = {PROFILE_FIELD_RELATIONS[field] for field in fields if field in PROFILE_FIELD_RELATIONS}
+        select_related = [relation for relation in PROFILE_SELECT_RELATED if relation in relations]
+        prefetch_related = [relation for relation in PROFILE_PREFETCH_RELATED if relation in relations]
+
+    # An empty select_related() would follow every foreign key, so only call it with explicit relations
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    return queryset.prefetch_related(*prefetch_related)
+
+
+def load_student_profile(student_id, fields=None):
+    """Fetch a student with all profile relations in a fixed number of queries"""
+    return get_student_profile_queryset(fields=fields).filter(pk=student_id).first()
+
+
+def annotate_student_list(queryset):
+    """
+    Annotate the per-row fields StudentUserSerializer shows in admin lists as correlated subqueries
+    so a whole page renders from a single SQL statement
+    The last onboarding step needs no subquery, it is a column on StudentUser
+    """
+    latest_education = StudentEducation.objects.filter(user=OuterRef('pk')).order_by('-created_at')
+    latest_foreign_university = StudentForeignUniversity.objects.filter(user=OuterRef('pk')).order_by('-created_at')
+    photograph = StudentDocument.objects.filter(
+        user=OuterRef('pk'), document_type='student_photograph'
+    ).order_by('-updated_at')
+
+    return queryset.annotate(
+        latest_institution_name=Subquery(latest_education.values('institution_name')[:1]),
+        latest_field_of_study=Subquery(latest_education.values('field_of_study')[:1]),
+        latest_foreign_university=Subquery(
+            latest_foreign_university.annotate(
+                summary=JSONObject(
+                    university_name='university_name',
+                    country='country',
+                    program_name='program_name',
+                    degree_level='degree_level',
+                )
+            ).values('summary')[:1],
+            output_field=JSONField(),
+        ),
+        photograph_file_name=Subquery(photograph.values('uploaded_file_name')[:1]),
+        photograph_thumbnail_file_name=Subquery(photograph.values('thumbnail_file_name')[:1]),
+    )
@@ -0,0 +1,138 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+
+from students.models import StudentAddress, StudentEducation, StudentJobExperience, StudentForeignUniversity, \
+    StudentFinancialInfo, StudentFinancerInfo, StudentPassport, StudentDocument, StudentOnboardingStep, \
+    StudentProfileSnapshot
+from students.serializers import StudentCompleteProfileSerializer
+from students.utility.profile_loader import load_student_profile
+
+logger = logging.getLogger(__name__)
+
+# Snapshot fields affected by a write to each related model, anything else triggers a full rebuild
+PROFILE_SNAPSHOT_SECTIONS = {
+    StudentAddress: ('addresses',),
+    StudentEducation: ('educations', 'university', 'department', 'onboarding_progress'),
+    StudentJobExperience: ('experiences', 'onboarding_progress'),
+    StudentForeignUniversity: ('universities', 'onboarding_progress'),
+    StudentFinancialInfo: ('financial_info', 'onboarding_progress'),
+    StudentFinancerInfo: ('financer_info', 'onboarding_progress'),
+    StudentPassport: ('passport', 'onboarding_progress'),
+    StudentDocument: ('documents', 'profile_image_icon', 'onboarding_progress'),
+    StudentOnboardingStep: ('onboarding_progress',),
+}
+
+# Rebuilds requested in the current thread's transaction, merged so a request writing many rows rebuilds once
+_pending_rebuilds = threading.local()
+
+
+def get_profile_snapshot(student_id):
+    """
+    Materialized StudentCompleteProfileSerializer output, or None if not built yet
+    Snapshots older than PROFILE_CACHE_TTL are ignored, a bound for writes that bypass the model signals
+    """
+    min_built_at = timezone.now() - timedelta(seconds=settings.PROFILE_CACHE_TTL)
+    return StudentProfileSnapshot.objects.filter(user_id=student_id, built_at__gte=min_built_at) \
+        .values_list('data', flat=True).first()
+
+
+def build_profile_snapshot(student):
+    """
+    Serialize a student loaded through profile_loader and store it as the snapshot, returns the serialized data
+    Stored with one INSERT ... ON CONFLICT, so concurrent misses on one student race harmlessly, and a student
+    deleted meanwhile is still answered from the serializer output
+    """
+    snapshot = dict(StudentCompleteProfileSerializer(student).data)
+    try:
+        with transaction.atomic():
+            StudentProfileSnapshot.objects.bulk_create(
+                [StudentProfileSnapshot(user_id=student.id, data=snapshot)],
+                update_conflicts=True, unique_fields=['user'], update_fields=['data', 'built_at'],
+            )
+    except IntegrityError as ex:
+        logger.warning(f"Profile snapshot of student {student.id} not stored: {ex}")
+    return snapshot
+
+
+def delete_profile_snapshot(student_id):
+    StudentProfileSnapshot.objects.filter(user_id=student_id).delete()
+
+
+def get_or_build_profile_snapshot(student_id):
+    snapshot = get_profile_snapshot(student_id)
+    if snapshot is not None:
+        return snapshot
+
+    student = load_student_profile(student_id)
+    if student is None:
+        return None
+    return build_profile_snapshot(student)
+
+
+def rebuild_profile_snapshot(student_id, sections=None):
+    """
+    Bring the snapshot up to date after a write
+    Only the given sections are re-serialized, loading just the relations they read
+    """
+    if sections is None:
+        if not StudentProfileSnapshot.objects.filter(user_id=student_id).exists():
+            # Nothing materialized yet, the next read builds it
+            return
+        student = load_student_profile(student_id)
+        if student is None:
+            delete_profile_snapshot(student_id)
+            return
+        build_profile_snapshot(student)
+        return
+
+    with transaction.atomic():
+        # Locked so concurrent section rebuilds of one student do not overwrite each other's sections
+        row = StudentProfileSnapshot.objects.select_for_update().filter(user_id=student_id).first()
+        if row is None:
+            return
+
+        student = load_student_profile(student_id, fields=sections)
+        if student is None:
+            row.delete()
+            return
+
+        serializer_fields = StudentCompleteProfileSerializer(student).fields
+        for section in sections:
+            field = serializer_fields[section]
+            row.data[section] = field.to_representation(field.get_attribute(student))
+        # built_at stays, the untouched sections (and their signed URLs) are no newer than before
+        row.save(update_fields=['data'])
+
+
+def schedule_profile_snapshot_rebuild(student_id, sections=None):
+    """Rebuild once the surrounding transaction commits, so the snapshot never sees uncommitted rows"""
+    pending = _pending_rebuilds.__dict__.setdefault('students', {})
+    if student_id in pending:
+        queued = pending[student_id]
+        pending[student_id] = None if queued is None or sections is None else tuple(set(queued) | set(sections))
+    else:
+        pending[student_id] = tuple(sections) if sections is not None else None
+
+    def rebuild():
+        # The first callback of the transaction rebuilds the merged sections, the rest find nothing left to do
+        if student_id not in pending:
+            return
+        merged_sections = pending.pop(student_id)
+        try:
+            rebuild_profile_snapshot(student_id, merged_sections)
+        except Exception as ex:
+            # Drop it rather than fail the write, the next read builds a fresh one
+            logger.error(f"Profile snapshot rebuild failed for student {student_id}: {ex}", exc_info=True)
+            delete_profile_snapshot(student_id)
+
+    transaction.on_commit(rebuild)
+
+
+def schedule_profile_snapshot_rebuild_for(instance):
+    """Rebuild the sections of the owning student's snapshot that depend on this related row"""
+    schedule_profile_snapshot_rebuild(instance.user_id, PROFILE_SNAPSHOT_SECTIONS.get(type(instance)))
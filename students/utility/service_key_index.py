@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+
+class ServiceKeyIndex:
+    """
+    In-process snapshot of ServiceKey rows so AuthMiddleware resolves services without touching the DB
+    Api keys are indexed by their SHA-256 digest, raw keys are never kept
+    The snapshot reloads after a short TTL, or as soon as the generation in the shared cache changes, which every
+    ServiceKey write bumps, so a revoked key stops working on all workers at once
+    """
+
+    generation_key = 'service_key_index_generation'
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._service_by_key_hash = {}
+        self._generation = None
+        self._loaded_at = None
+
+    @staticmethod
+    def hash_key(api_key):
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+    def get_generation(self):
+        # Random rather than a counter, a generation evicted from the cache can never come back with an old value
+        return cache.get_or_set(self.generation_key, uuid.uuid4().hex, timeout=None)
+
+    def is_stale(self, generation):
+        return (self._loaded_at is None or self._generation != generation
+                or time.monotonic() - self._loaded_at > self.ttl)
+
+    def refresh(self, generation):
+        from students.models import ServiceKey
+
+        self._service_by_key_hash = {
+            self.hash_key(secret_key): service
+            for secret_key, service in ServiceKey.objects.values_list('secret_key', 'service')
+        }
+        self._generation = generation
+        self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self):
+        # Read before the rows, a write landing during the reload leaves the snapshot behind the next generation
+        generation = self.get_generation()
+        if not self.is_stale(generation):
+            return
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self.is_stale(generation):
+                self.refresh(generation)
+
+    def invalidate(self):
+        """Drop the snapshot on every worker"""
+        cache.set(self.generation_key, uuid.uuid4().hex, timeout=None)
+        self._loaded_at = None
+
+    def get_service(self, api_key):
+        if not api_key:
+            return None
+        self.ensure_fresh()
+        return self._service_by_key_hash.get(self.hash_key(api_key))
+
+
+service_key_index = ServiceKeyIndex(ttl=settings.SERVICE_KEY_INDEX_TTL)
+
+
+def invalidate_service_key_index(sender, **kwargs):
+    service_key_index.invalidate()
+
+
+post_save.connect(invalidate_service_key_index, sender='students.ServiceKey',
+                  dispatch_uid='service_key_index_save')
+post_delete.connect(invalidate_service_key_index, sender='students.ServiceKey',
+                    dispatch_uid='service_key_index_delete')
@@ -0,0 +1,79 @@
+import hashlib
+import tempfile
+import mimetypes
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+
+from students.utility.chunked_upload import STREAM_READ_SIZE
+from students.utility.document_helper import get_document_storage, build_file_name
+from students.validators import check_content_type, SNIFF_SIZE
+
+SIGNED_UPLOAD_SALT = 'students.signed-document-upload'
+
+
+def issue_signed_upload(user, document_type, filename, total_size):
+    """
+    Reserve a bucket path for a direct-to-bucket upload and sign a PUT URL for it
+    The returned upload_token carries everything the completion call verifies, so no row is written until then
+    """
+    file_name = build_file_name(filename, f"STUDENT/u{user.id}/{document_type}")
+    content_type = mimetypes.guess_type(filename)[0]
+    expiration = settings.STUDENT_DOCUMENT_SIGNED_UPLOAD_TTL
+
+    upload_url = get_document_storage().generate_upload_url(file_name, content_type, expiration)
+    upload_token = signing.dumps({
+        'user_id': user.id,
+        'document_type': document_type,
+        'original_filename': filename,
+        'file_name': file_name,
+        'total_size': total_size,
+        'content_type': content_type,
+    }, salt=SIGNED_UPLOAD_SALT)
+
+    return {
+        'upload_url': upload_url,
+        'method': 'PUT',
+        'headers': {'Content-Type': content_type},
+        'upload_token': upload_token,
+        'expires_in': int(expiration.total_seconds()),
+    }
+
+
+def load_signed_upload(upload_token):
+    """
+    Claims of an issued upload, raises signing.BadSignature if tampered with or too old
+    Completion is accepted for twice the URL lifetime, an upload started just before expiry still has to finish
+    """
+    return signing.loads(upload_token, salt=SIGNED_UPLOAD_SALT, max_age=settings.STUDENT_DOCUMENT_SIGNED_UPLOAD_TTL * 2)
+
+
+def verify_signed_upload(claims):
+    """Check the object the client put in the bucket against what was signed, returns an error message or None"""
+    metadata = get_document_storage().get_upload_metadata(claims['file_name'])
+    if metadata is None:
+        return "File has not been uploaded"
+    if metadata['size'] != claims['total_size']:
+        return f"Uploaded {metadata['size']} bytes, expected {claims['total_size']}"
+    if metadata['content_type'] != claims['content_type']:
+        return f"Uploaded content type {metadata['content_type']}, expected {claims['content_type']}"
+
+    # The Content-Type header is the client's claim, check the bytes as well
+    header = get_document_storage().read_header(claims['file_name'], SNIFF_SIZE)
+    try:
+        check_content_type(claims['original_filename'], header)
+    except ValidationError as ex:
+        return ex.messages[0]
+    return None
+
+
+def get_signed_upload_hash(claims):
+    """SHA-256 of the uploaded object, streamed through a temp file like the other uploads are hashed"""
+    digest = hashlib.sha256()
+    with tempfile.TemporaryFile() as spool:
+        get_document_storage().download_to_file(claims['file_name'], spool)
+        spool.seek(0)
+        for data in iter(lambda: spool.read(STREAM_READ_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
@@ -0,0 +1,24 @@
+# Runs in the thumbnail process pool, whose forkserver workers import this module without Django set up,
+# so nothing here may import models or settings
+import io
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+
+def render_thumbnail(data, size):
+    """Runs in the thumbnail pool: image bytes -> (thumbnail bytes, extension), WebP where Pillow supports it"""
+    with Image.open(io.BytesIO(data)) as image:
+        # Lets JPEG decode at a reduced scale instead of full resolution
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+
+        output = io.BytesIO()
+        if features.check('webp'):
+            image.save(output, 'WEBP', quality=80)
+            return output.getvalue(), '.webp'
+        image.convert('RGB').save(output, 'JPEG', quality=80)
+        return output.getvalue(), '.jpg'
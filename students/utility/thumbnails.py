@@ -0,0 +1,100 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction, close_old_connections
+
+from students.models import StudentDocument
+from students.utility.document_gc import enqueue_orphaned_objects
+from students.utility.document_helper import get_document_storage, upload_executor
+from students.utility.profile_snapshot import schedule_profile_snapshot_rebuild
+from students.utility.thumbnail_render import Image, render_thumbnail
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DOCUMENT_TYPES = ('student_photograph', 'financer_photograph')
+THUMBNAIL_SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+_thumbnail_executor = None
+_thumbnail_executor_lock = threading.Lock()
+
+
+def get_thumbnail_executor():
+    """
+    Process pool for image decoding, created on first use
+    Workers come from a forkserver, so they never inherit this process's threads, locks or DB connections
+    """
+    global _thumbnail_executor
+    if _thumbnail_executor is None:
+        with _thumbnail_executor_lock:
+            if _thumbnail_executor is None:
+                _thumbnail_executor = ProcessPoolExecutor(
+                    max_workers=settings.THUMBNAIL_MAX_WORKERS,
+                    mp_context=multiprocessing.get_context('forkserver'),
+                )
+    return _thumbnail_executor
+
+
+def get_thumbnail_file_name(uploaded_file_name, extension):
+    folder, file_name = os.path.split(uploaded_file_name)
+    return f"{folder}/thumbnails/{os.path.splitext(file_name)[0]}{extension}"
+
+
+def needs_thumbnail(document):
+    return (
+        Image is not None
+        and document.document_type in THUMBNAIL_DOCUMENT_TYPES
+        and not document.thumbnail_file_name
+        and os.path.splitext(document.uploaded_file_name)[1].lower() in THUMBNAIL_SOURCE_EXTENSIONS
+    )
+
+
+def generate_thumbnail(document_id, user_id, uploaded_file_name):
+    """Render and store the thumbnail of one stored photograph and point its document at it"""
+    storage = get_document_storage()
+    with storage.open(uploaded_file_name) as original:
+        data = original.read()
+
+    thumbnail, extension = get_thumbnail_executor().submit(render_thumbnail, data, settings.THUMBNAIL_SIZE).result()
+    thumbnail_file_name = get_thumbnail_file_name(uploaded_file_name, extension)
+    storage.save(thumbnail_file_name, ContentFile(thumbnail))
+
+    with transaction.atomic():
+        # Only if the document still holds this photograph, a newer upload gets its own thumbnail
+        updated = StudentDocument.objects.filter(
+            id=document_id, uploaded_file_name=uploaded_file_name
+        ).update(thumbnail_file_name=thumbnail_file_name)
+
+        if updated:
+            schedule_profile_snapshot_rebuild(user_id, ('documents', 'profile_image_icon'))
+        else:
+            enqueue_orphaned_objects([thumbnail_file_name], reason='stale_thumbnail', delay=timedelta(0))
+
+
+def generate_thumbnail_in_background(document_id, user_id, uploaded_file_name):
+    def run():
+        # Pool threads outlive requests, so they drop stale connections like the request cycle does
+        close_old_connections()
+        try:
+            generate_thumbnail(document_id, user_id, uploaded_file_name)
+        except Exception as ex:
+            # The icon falls back to the original photograph
+            logger.error(f"Thumbnail generation failed for document {document_id}: {ex}", exc_info=True)
+        finally:
+            close_old_connections()
+
+    upload_executor.submit(run)
+
+
+def schedule_thumbnails(documents):
+    """Generate thumbnails for the photographs among documents once the surrounding transaction commits"""
+    for document in documents:
+        if needs_thumbnail(document):
+            transaction.on_commit(lambda document=document: generate_thumbnail_in_background(
+                document.id, document.user_id, document.uploaded_file_name
+            ))
@@ -4,11 +4,54 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.template.defaultfilters import filesizeformat
 
+DOCUMENT_EXTENSIONS = ('pdf', 'jpg', 'png', 'jpeg')
+
+# Bytes read from the start of a file to recognise its real type
+SNIFF_SIZE = 8 * 1024
+
+# Leading bytes of each content type documents are accepted as
+MAGIC_NUMBERS = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+)
+
+EXTENSION_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+
+def sniff_content_type(header):
+    """Content type recognised from the first bytes of a file, None if it is none of MAGIC_NUMBERS"""
+    for magic, content_type in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return content_type
+    # Readers accept a PDF header anywhere in the first 1KB
+    if b'%PDF-' in header[:1024]:
+        return 'application/pdf'
+    return None
+
+
+def check_content_type(file_name, header):
+    """Raise ValidationError if the bytes do not match what the file's extension claims"""
+    ext = splitext(file_name)[1][1:].lower()
+    expected = EXTENSION_CONTENT_TYPES.get(ext)
+    if expected and sniff_content_type(header) != expected:
+        raise ValidationError(FileValidator.content_type_message % {'extension': ext})
+
+
 class FileValidator(object):
-    """File validator - same as old backend"""
-    
+    """
+    File validator - same as old backend
+    Also checks the real content type from the first bytes, only those are read from the file
+    """
+
     extension_message = _("Extension '%(extension)s' not allowed. Allowed extensions are: %(allowed_extensions)s")
     max_size_message = _('The current file %(size)s, which is too large. The maximum file size is %(allowed_size)s.')
+    content_type_message = _("The file content does not match its '%(extension)s' extension.")
 
     def __init__(self, *args, **kwargs):
         self.allowed_extensions = kwargs.pop('allowed_extensions', None)
@@ -24,11 +67,33 @@ class FileValidator(object):
             }
             raise ValidationError(message)
 
+        header, filesize = self.scan(value)
+
         # Check the file size
-        filesize = len(value)
         if self.max_size and filesize > self.max_size:
             message = self.max_size_message % {
                 'size': filesizeformat(filesize),
                 'allowed_size': filesizeformat(self.max_size)
             }
-            raise ValidationError(message)
\ No newline at end of file
+            raise ValidationError(message)
+
+        # Check the content is what the extension says
+        check_content_type(value.name, header)
+
+    def scan(self, value):
+        """First SNIFF_SIZE bytes and the size, the size comes from the upload so the rest is never read"""
+        value.seek(0)
+        header = value.read(SNIFF_SIZE)
+        value.seek(0)
+        return header, value.size
+
+
+def validate_files(files, validator):
+    """Run one validator over all submitted files, returns field -> messages for the ones that failed"""
+    errors = {}
+    for field, value in files.items():
+        try:
+            validator(value)
+        except ValidationError as ex:
+            errors[field] = ex.messages
+    return errors
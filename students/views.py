@@ -1,30 +1,113 @@
-from api_clients.priyopay_client import PriyoPayClient
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
 from rest_framework.generics import GenericAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from student_portal.permissions import IsStudentAdmin, IsBankAdmin
 from students.models import StudentUser
+from utilities.circuit_breaker import UpstreamUnavailable
+from students.utility.priyopay import (
+    get_priyopay_client, get_guard_statuses, coalesced_fetch, fx_rate_cache,
+    deposit_claims_cache, conversions_cache, bdt_usd_conversions_cache,
+)
+from students.utility.priyopay_mirror import deposit_claims_mirror, conversions_mirror, bdt_usd_conversions_mirror
 from students.serializers import DepositClaimApproveSerializer, ConversionApproveSerializer, ConversionCreateSerializer
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
+# Proxy requests served under ASGI run here, see async_proxy_view
+proxy_executor = ThreadPoolExecutor(max_workers=settings.PRIYOPAY_ASYNC_PROXY_MAX_WORKERS,
+                                    thread_name_prefix='priyopay-proxy')
+
+
+def async_proxy_view(view_class):
+    """
+    Async entry point for a PriyoPay proxy view, for deployments under ASGI
+    The DRF view and its blocking PriyoPay call run whole on proxy_executor, off the event loop and
+    off the per-request thread sync views get, with AuthMiddleware async-capable no other thread is held
+    """
+    view = view_class.as_view()
+
+    def run(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+            # Rendered here, not on the event loop
+            return response.render() if hasattr(response, 'render') else response
+        finally:
+            close_old_connections()
+
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False, executor=proxy_executor)(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+class PriyoPayProxyView(APIView):
+    """Proxy to PriyoPay, calls refused by a breaker or bulkhead fail fast with 503 instead of tying up the worker"""
+
+    def handle_exception(self, exc):
+        if isinstance(exc, UpstreamUnavailable):
+            headers = {'Retry-After': str(max(1, int(exc.retry_after or 1)))}
+            return Response({'error': 'PriyoPay is temporarily unavailable, please try again shortly'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=headers)
+        return super().handle_exception(exc)
+
+    def get_mirrored(self, request, mirror, pk=None, student_id=None):
+        """
+        Serve a GET from the local mirror, lists are filtered and sorted with its indexes
+        and answered in PriyoPay's own list shape, so clients see the same body either way
+        None when the detail asked for is not mirrored yet, PriyoPay is asked instead
+        """
+        if pk:
+            record = mirror.get_record(pk, student_id=student_id)
+            return Response(record.payload, status=status.HTTP_200_OK) if record else None
+
+        filterset = mirror.filterset_class(request.query_params, queryset=mirror.model.objects.only('payload'))
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = [record.payload for record in filterset.qs]
+        return Response({'count': len(results), 'next': None, 'previous': None, 'results': results},
+                        status=status.HTTP_200_OK)
+
+    @staticmethod
+    def write_through(mirror, pk, changes, response, status_code):
+        """Keep the mirror in step with a change PriyoPay accepted, the next sync corrects anything missed"""
+        if status_code is not None and int(status_code) < 400:
+            mirror.write_through(pk, changes, response)
+
+
+class PriyoPayStatusView(APIView):
+    http_method_names = ['get']
+    permission_classes = [IsBankAdmin | IsStudentAdmin]
+
+    def get(self, request, *args, **kwargs):
+        """Breaker state and call/rejection counts of every PriyoPay operation used by this worker process"""
+        return Response({'operations': get_guard_statuses()}, status=status.HTTP_200_OK)
+
 
-class DepositClaimsView(APIView):
+class DepositClaimsView(PriyoPayProxyView):
     http_method_names = ['get', 'patch']
     permission_classes = [IsBankAdmin | IsStudentAdmin]
 
     def get(self, request, pk=None, *args, **kwargs):
-        response, _ = PriyoPayClient().fetch_deposit_claims()
+        if deposit_claims_mirror.is_ready():
+            mirrored = self.get_mirrored(request, deposit_claims_mirror, pk)
+            if mirrored is not None:
+                return mirrored
 
-        # If pk is provided, return specific deposit
+        # If pk is provided, return specific deposit from the indexed list cache
         if pk:
-            if response and 'results' in response:
-                for deposit in response['results']:
-                    if str(deposit.get('id')) == str(pk) or str(deposit.get('claim_id')) == str(pk):
-                        return Response(deposit, status=status.HTTP_200_OK)
+            deposit = deposit_claims_cache.get_item(pk)
+            if deposit is not None:
+                return Response(deposit, status=status.HTTP_200_OK)
             return Response({'error': 'Deposit not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Otherwise return all deposits
+        # Otherwise return all deposits, fetched fresh and cached for the detail lookups
+        response = deposit_claims_cache.refresh()
         return Response(response, status=status.HTTP_200_OK)
 
     def patch(self, request, pk=None, *args, **kwargs):
@@ -35,14 +118,16 @@ class DepositClaimsView(APIView):
         serializer = DepositClaimApproveSerializer(data={'claim_id': claim_id})
         serializer.is_valid(raise_exception=True)
 
-        response, _ = PriyoPayClient().update_deposit_claims(
+        response, status_code = get_priyopay_client().update_deposit_claims(
             claim_id=claim_id,
             payload={'claim_status': 'APPROVED'}
         )
+        deposit_claims_cache.invalidate()
+        self.write_through(deposit_claims_mirror, claim_id, {'claim_status': 'APPROVED'}, response, status_code)
         return Response(response, status=status.HTTP_200_OK)
 
 
-class BDTtoUSDView(APIView):
+class BDTtoUSDView(PriyoPayProxyView):
     http_method_names = ['get', 'post', 'patch']
     permission_classes = [IsBankAdmin | IsStudentAdmin]
 
@@ -53,22 +138,27 @@ class BDTtoUSDView(APIView):
         if student_id:
             custom_param = {"student_id": student_id}
 
-        response, _ = PriyoPayClient().fetch_conversions(params=custom_param)
+        if conversions_mirror.is_ready():
+            mirrored = self.get_mirrored(request, conversions_mirror, pk, student_id=student_id)
+            if mirrored is not None:
+                return mirrored
 
-        # If pk is provided, return specific conversion
+        # If pk is provided, return specific conversion from the indexed list cache
         if pk:
-            if response and 'results' in response:
-                for conversion in response['results']:
-                    if str(conversion.get('id')) == str(pk) or str(conversion.get('conversion_id')) == str(pk):
-                        return Response(conversion, status=status.HTTP_200_OK)
+            conversion = conversions_cache.get_item(pk, params=custom_param)
+            if conversion is not None:
+                return Response(conversion, status=status.HTTP_200_OK)
             return Response({'error': 'Conversion not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Otherwise return all conversions
+        # Otherwise return all conversions, fetched fresh and cached for the detail lookups
+        response = conversions_cache.refresh(params=custom_param)
         return Response(response, status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
         # Create new conversion request - send raw data without validation
-        response, status_code = PriyoPayClient().create_conversion(payload=request.data)
+        response, status_code = get_priyopay_client().create_conversion(payload=request.data)
+        conversions_cache.invalidate()
+        self.write_through(conversions_mirror, conversions_mirror.get_remote_id(response), {}, response, status_code)
         return Response(response, status=status_code)
 
     def patch(self, request, pk=None, *args, **kwargs):
@@ -80,14 +170,17 @@ class BDTtoUSDView(APIView):
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
 
-        response, _ = PriyoPayClient().update_conversion(
+        response, status_code = get_priyopay_client().update_conversion(
             conversion_id=conversion_id,
             payload={'request_status': validated_data['request_status'], 'admin_id': request.user.id}
         )
+        conversions_cache.invalidate()
+        self.write_through(conversions_mirror, conversion_id, {'request_status': validated_data['request_status']},
+                           response, status_code)
         return Response(response, status=status.HTTP_200_OK)
 
 
-class USDAccountsView(APIView):
+class USDAccountsView(PriyoPayProxyView):
     http_method_names = ['get']
     permission_classes = [IsStudentAdmin | IsBankAdmin]
 
@@ -98,7 +191,12 @@ class USDAccountsView(APIView):
         """
         if user_id:
             # Get specific account by user_id (treating user_id as account_id)
-            response, status_code = PriyoPayClient().fetch_usd_account_by_id(account_id=user_id)
+            response, status_code = coalesced_fetch(
+                'usd_account',
+                lambda params: get_priyopay_client().fetch_usd_account_by_id(**params),
+                params={'account_id': user_id},
+                scope=request.user._meta.label_lower,
+            )
             return Response(response, status=status_code)
         else:
             # Get all accounts with optional query parameters
@@ -118,11 +216,16 @@ class USDAccountsView(APIView):
             if request.GET.get('offset'):
                 query_params['offset'] = request.GET.get('offset')
 
-            response, status_code = PriyoPayClient().fetch_usd_accounts(**query_params)
+            response, status_code = coalesced_fetch(
+                'usd_accounts',
+                lambda params: get_priyopay_client().fetch_usd_accounts(**params),
+                params=query_params,
+                scope=request.user._meta.label_lower,
+            )
             return Response(response, status=status_code)
 
 
-class CurrencyConversionView(APIView):
+class CurrencyConversionView(PriyoPayProxyView):
     http_method_names = ['post']
     permission_classes = [IsBankAdmin | IsStudentAdmin]
 
@@ -136,28 +239,36 @@ class CurrencyConversionView(APIView):
             "amount": 1
         }
         """
-        response, status_code = PriyoPayClient().convert_currency(payload=request.data)
+        quote = fx_rate_cache.quote(request.data)
+        if quote is not None:
+            return Response(quote, status=status.HTTP_200_OK)
+
+        response, status_code = get_priyopay_client().convert_currency(payload=request.data)
+        fx_rate_cache.remember(request.data, response, status_code)
         return Response(response, status=status_code)
 
 
-class BDTUSDConversionView(APIView):
+class BDTUSDConversionView(PriyoPayProxyView):
     http_method_names = ['get', 'post', 'patch']
     permission_classes = [IsBankAdmin | IsStudentAdmin]
     parser_classes = [MultiPartParser, FormParser, JSONParser]  # Support file uploads
 
     def get(self, request, pk=None, *args, **kwargs):
         """Fetch BDT to USD conversion requests"""
-        response, _ = PriyoPayClient().fetch_bdt_usd_conversions()
+        if bdt_usd_conversions_mirror.is_ready():
+            mirrored = self.get_mirrored(request, bdt_usd_conversions_mirror, pk)
+            if mirrored is not None:
+                return mirrored
 
-        # If pk is provided, return specific conversion
+        # If pk is provided, return specific conversion from the indexed list cache
         if pk:
-            if response and 'results' in response:
-                for conversion in response['results']:
-                    if str(conversion.get('id')) == str(pk):
-                        return Response(conversion, status=status.HTTP_200_OK)
+            conversion = bdt_usd_conversions_cache.get_item(pk)
+            if conversion is not None:
+                return Response(conversion, status=status.HTTP_200_OK)
             return Response({'error': 'Conversion not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Otherwise return all conversions
+        # Otherwise return all conversions, fetched fresh and cached for the detail lookups
+        response = bdt_usd_conversions_cache.refresh()
         return Response(response, status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
@@ -182,10 +293,13 @@ class BDTUSDConversionView(APIView):
         if 'expense_document' in request.FILES:
             files['expense_document'] = request.FILES['expense_document']
 
-        response, status_code = PriyoPayClient().create_bdt_usd_conversion(
+        response, status_code = get_priyopay_client().create_bdt_usd_conversion(
             data=data,
             files=files if files else None
         )
+        bdt_usd_conversions_cache.invalidate()
+        self.write_through(bdt_usd_conversions_mirror, bdt_usd_conversions_mirror.get_remote_id(response), {}, response,
+                           status_code)
         return Response(response, status=status_code)
 
     def patch(self, request, pk=None, *args, **kwargs):
@@ -203,8 +317,11 @@ class BDTUSDConversionView(APIView):
             'admin_id': request.data.get('admin_id', request.user.id)
         }
 
-        response, status_code = PriyoPayClient().update_bdt_usd_conversion_status(
+        response, status_code = get_priyopay_client().update_bdt_usd_conversion_status(
             conversion_id=conversion_id,
             payload=payload
         )
+        bdt_usd_conversions_cache.invalidate()
+        self.write_through(bdt_usd_conversions_mirror, conversion_id, {'request_status': payload['request_status']},
+                           response, status_code)
         return Response(response, status=status_code)
@@ -1,11 +1,21 @@
 import logging
-
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from django.contrib.auth import get_user_model
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
@@ -15,12 +25,30 @@ from students.enums import StudentOnboardingSteps
 from students.filters import UserEducationFilterSet, UserExperienceFilterSet, StudentPrimaryInfoFilterSet, \
     UserForeignUniversityFilterSet, UserFinancialInfoFilterSet, UserFinancerInfoFilterSet, StudentUsersFilterSet
 from students.models import StudentOnboardingStep, StudentEducation, StudentJobExperience, StudentPassport, \
-    StudentForeignUniversity, StudentFinancialInfo, StudentFinancerInfo, StudentDocument, StudentAddress, StudentUser
+    StudentForeignUniversity, StudentFinancialInfo, StudentFinancerInfo, StudentDocument, StudentAddress, StudentUser, \
+    StudentDocumentUpload, StudentDocumentIngestJob
 from students.serializers import StudentOnboardingStepSerializer, StudentEducationSerializer, \
     StudentJobExperienceSerializer, StudentPassportSerializer, StudentForeignUniversitySerializer, \
     StudentFinancialInfoSerializer, StudentFinancerInfoSerializer, StudentDocumentSerializer, \
-    StudentDocumentUploadSerializer, StudentAddressSerializer, StudentCompleteProfileSerializer, StudentUserSerializer
-from students.utility.document_helper import google_bucket_file_upload, build_file_name, google_bucket_file_delete
+    StudentDocumentUploadSerializer, StudentAddressSerializer, StudentCompleteProfileSerializer, StudentUserSerializer, \
+    StudentDocumentUploadStartSerializer, StudentDocumentUploadSessionSerializer, \
+    StudentDocumentSignedUploadCompleteSerializer, StudentDocumentIngestJobSerializer
+from students.utility.document_helper import google_bucket_file_upload, build_file_name, \
+    google_bucket_files_upload, get_document_storage, get_content_hash
+from students.utility.document_storage import LocalDocumentStorage
+from students.utility.chunked_upload import parse_content_range, store_upload_chunk, assemble_upload, \
+    IncompleteChunkError, STREAM_READ_SIZE
+from students.utility.document_export import stream_documents_zip
+from students.utility.document_gc import enqueue_orphaned_objects
+from students.utility.document_ingest import submit_ingest_job, spool_files, open_spooled_files, remove_spool
+from students.utility.thumbnails import schedule_thumbnails
+from students.utility.signed_upload import issue_signed_upload, load_signed_upload, verify_signed_upload, \
+    get_signed_upload_hash
+from students.utility.profile_loader import get_student_profile_queryset, annotate_student_list
+from students.utility.onboarding_state import sync_onboarding_state
+from students.utility.profile_snapshot import get_profile_snapshot, get_or_build_profile_snapshot, \
+    build_profile_snapshot
+from students.validators import validate_files
 from student_portal.permissions import IsStudent, IsBankAdmin, IsStudentAdmin, IsPriyoPay, IsAnyAdmin, is_any_admin
 
 logger = logging.getLogger(__name__)
@@ -129,31 +157,41 @@ class OnboardingProgressViewSet(APIView):
         else:
             return Response({'error': 'Invalid token type'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Get all onboarding steps for the user
-        steps = StudentOnboardingStep.objects.filter(user=target_user)
-        finished_steps = steps.values_list('step', flat=True)
+        if target_user is None:
+            return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Summary comes from the denormalized onboarding columns, read fresh since request.user may be cached
+        state = StudentUser.objects.filter(pk=target_user.id).values(
+            'onboarding_steps_mask', 'onboarding_progress'
+        ).first()
+        if state is None:
+            return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+        steps_by_name = {step_obj.step: step_obj for step_obj in StudentOnboardingStep.objects.filter(user=target_user)}
+
+        if not state['onboarding_steps_mask'] and any(step_obj.is_completed for step_obj in steps_by_name.values()):
+            # Columns not backfilled yet for this student, compute them now
+            mask, _, progress = sync_onboarding_state(target_user.id)
+            state = {'onboarding_steps_mask': mask, 'onboarding_progress': progress}
 
         # Build response similar to old backend
         expected_steps = StudentOnboardingSteps.values()
         response = []
 
         for step in expected_steps:
-            step_obj = steps.filter(step=step).first()
+            step_obj = steps_by_name.get(step)
             response.append({
                 'step': step,
-                'finished': step in finished_steps,
-                'is_completed': step_obj.is_completed if step_obj else False,
+                'finished': step in steps_by_name,
+                'is_completed': bool(state['onboarding_steps_mask'] & StudentOnboardingSteps.mask_bit(step)),
                 'completed_at': step_obj.completed_at if step_obj else None,
                 'step_data': step_obj.step_data if step_obj else {}
             })
 
-        # Calculate progress percentage
-        completed_steps = len([s for s in response if s['is_completed']])
-        progress_percentage = (completed_steps / len(expected_steps) * 100) if expected_steps else 0
+        completed_steps = bin(state['onboarding_steps_mask']).count('1')
 
         return Response({
             'user_id': target_user.id,
-            'progress_percentage': progress_percentage,
+            'progress_percentage': state['onboarding_progress'],
             'completed_steps': completed_steps,
             'total_steps': len(expected_steps),
             'steps': response
@@ -336,17 +374,28 @@ class StudentDocumentsViewSet(BaseStudentViewSet):
         return StudentDocumentSerializer
 
     def create(self, request, *args, **kwargs):
-        """Upload student documents - same logic as old backend"""
+        """
+        Upload student documents - same logic as old backend
+        With a Prefer: respond-async header the files are only validated and spooled, the response is 202
+        with an ingest job to poll at /student-document-ingest-jobs/{id}/
+        """
         serializer = StudentDocumentUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        response_data, error_msg = self.upload_student_documents(
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            return self.defer_upload(request, serializer.validated_data)
+
+        response_data, error_msg, failed_uploads = self.upload_student_documents(
             serializer.validated_data,
             request.user
         )
 
         if error_msg:
-            return Response({'Error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'Error': error_msg,
+                'failed_uploads': failed_uploads,
+                'uploaded_documents': StudentDocumentSerializer(response_data, many=True).data
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(
             data=StudentDocumentSerializer(response_data, many=True).data,
@@ -379,29 +428,46 @@ class StudentDocumentsViewSet(BaseStudentViewSet):
                     break
 
             if uploaded_file:
-                # Build bucket path - same as old backend
-                bucket_folder_name = f"STUDENT/u{request.user.id}/{new_doc_type}"
-                file_name = build_file_name(uploaded_file, bucket_folder_name)
-
-                # Upload new file to GCP
-                gcp_file_path, error_msg = google_bucket_file_upload(uploaded_file, file_name)
-
-                if error_msg:
-                    return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
-
-                if gcp_file_path:
-                    # Delete old file from GCP if it exists
-                    if instance.uploaded_file_name:
-                        google_bucket_file_delete(instance.uploaded_file_name)
-
-                    # Update the existing document record
-                    instance.document_type = new_doc_type
-                    instance.original_filename = uploaded_file.name
-                    instance.uploaded_file_name = gcp_file_path
-                    instance.file_size = uploaded_file.size
-                    instance.save()
+                errors = validate_files({new_doc_type: uploaded_file}, StudentDocumentUploadSerializer.document_validator)
+                if errors:
+                    return Response({'error': errors[new_doc_type]}, status=status.HTTP_400_BAD_REQUEST)
+
+                original_filename = uploaded_file.name
+                content_hash = get_content_hash(uploaded_file)
+
+                if instance.document_type == new_doc_type and instance.content_hash == content_hash:
+                    # Same content is already stored for this document, keep the object
+                    instance.original_filename = original_filename
+                    instance.save(update_fields=['original_filename', 'updated_at'])
                 else:
-                    return Response({'error': 'Failed to upload file'}, status=status.HTTP_400_BAD_REQUEST)
+                    # Build bucket path - same as old backend
+                    bucket_folder_name = f"STUDENT/u{request.user.id}/{new_doc_type}"
+                    file_name = build_file_name(uploaded_file, bucket_folder_name)
+
+                    # Upload new file to GCP
+                    gcp_file_path, error_msg = google_bucket_file_upload(uploaded_file, file_name)
+
+                    if error_msg:
+                        return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+
+                    if gcp_file_path:
+                        with transaction.atomic():
+                            # The old file is purged in the background once nothing points at it
+                            enqueue_orphaned_objects(
+                                [instance.uploaded_file_name, instance.thumbnail_file_name], reason='superseded'
+                            )
+
+                            # Update the existing document record
+                            instance.document_type = new_doc_type
+                            instance.original_filename = original_filename
+                            instance.uploaded_file_name = gcp_file_path
+                            instance.file_size = uploaded_file.size
+                            instance.content_hash = content_hash
+                            instance.thumbnail_file_name = None
+                            instance.save()
+                            schedule_thumbnails([instance])
+                    else:
+                        return Response({'error': 'Failed to upload file'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Handle metadata updates (description, verification_status, etc.)
         serializer = StudentDocumentSerializer(instance, data=request.data, partial=True)
@@ -414,9 +480,101 @@ class StudentDocumentsViewSet(BaseStudentViewSet):
         """PATCH /student-documents/{id}/ - Same as update for partial updates"""
         return self.update(request, *args, **kwargs)
 
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsBankAdmin | IsStudentAdmin])
+    def export(self, request, *args, **kwargs):
+        """
+        GET /student-documents/export/?student_id={id} - ZIP of every document of the students, streamed
+        student_id may be repeated, or replaced by any StudentUsersFilterSet filter to export a filtered set
+        """
+        student_ids = request.query_params.getlist('student_id')
+        if not all(student_id.isdigit() for student_id in student_ids):
+            return Response({'error': 'student_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        students = StudentUser.objects.all()
+        if student_ids:
+            students = students.filter(id__in=student_ids)
+
+        filterset = StudentUsersFilterSet(request.query_params, queryset=students)
+        if not filterset.is_valid():
+            return Response({'error': filterset.errors}, status=status.HTTP_400_BAD_REQUEST)
+        if not student_ids and not any(name in request.query_params for name in filterset.filters):
+            return Response({'error': 'Pass student_id or student filters to choose what to export'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        documents = list(
+            StudentDocument.objects.filter(user__in=filterset.qs.values('id'))
+            .select_related('user')
+            .only('uploaded_file_name', 'document_type', 'updated_at',
+                  'user__id', 'user__first_name', 'user__last_name')
+            .order_by('user_id', 'document_type')
+        )
+
+        file_name = f"student-{student_ids[0]}-documents.zip" if len(student_ids) == 1 else "student-documents.zip"
+        response = StreamingHttpResponse(stream_documents_zip(documents), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        return response
+
+    def defer_upload(self, request, validated_data):
+        files = {doc_type: uploaded_file for doc_type, uploaded_file in validated_data.items() if uploaded_file}
+        if not files:
+            return Response({'Error': "No files provided for upload!"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = StudentDocumentIngestJob(user=request.user)
+        try:
+            job.files = spool_files(job.id, files)
+            job.save()
+        except Exception:
+            remove_spool(job.id)
+            raise
+        transaction.on_commit(lambda: submit_ingest_job(self.ingest_student_documents, job.id))
+
+        status_url = reverse('student_document_ingest_jobs-detail', args=[job.id])
+        response = Response(StudentDocumentIngestJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = request.build_absolute_uri(status_url)
+        return response
+
     @classmethod
-    def upload_student_documents(cls, validated_data, user):
-        """Upload logic for CREATE - adapted from old backend"""
+    def ingest_student_documents(cls, job_id):
+        """Worker side of a deferred upload: push the spooled files through the same path as create"""
+        job = StudentDocumentIngestJob.objects.select_related('user').get(id=job_id)
+        job.status = StudentDocumentIngestJob.STATUS_PROCESSING
+        job.save(update_fields=['status', 'updated_at'])
+
+        def on_file_uploaded(doc_type, result):
+            gcp_file_path, error_msg = result
+            job.files[doc_type]['status'] = (
+                StudentDocumentIngestJob.FILE_UPLOADED if gcp_file_path else StudentDocumentIngestJob.FILE_FAILED
+            )
+            job.files[doc_type]['error'] = error_msg or ''
+            job.save(update_fields=['files', 'updated_at'])
+
+        files = {}
+        try:
+            files = open_spooled_files(job)
+            documents, error_msg, failed_uploads = cls.upload_student_documents(
+                files, job.user, on_file_uploaded=on_file_uploaded
+            )
+        except Exception as ex:
+            logger.error(f"Document ingest job {job_id} failed: {ex}", exc_info=True)
+            documents, error_msg = [], str(ex)
+        finally:
+            for spooled in files.values():
+                spooled.close()
+            remove_spool(job_id)
+
+        for document in documents:
+            job.files[document.document_type]['document'] = document.id
+        job.status = StudentDocumentIngestJob.STATUS_FAILED if error_msg else StudentDocumentIngestJob.STATUS_COMPLETED
+        job.error = error_msg
+        job.save(update_fields=['files', 'status', 'error', 'updated_at'])
+
+    @classmethod
+    def upload_student_documents(cls, validated_data, user, on_file_uploaded=None):
+        """
+        Upload logic for CREATE - adapted from old backend
+        Files go to the bucket concurrently, rows are written in one transaction once every upload has finished
+        on_file_uploaded(doc_type, (bucket file name or None, error message)) reports each file as it finishes
+        """
         document_types = [
             'student_photograph', 'financer_photograph', 'student_signature',
             'financer_signature', 'admission_letter', 'educational_certificate',
@@ -425,64 +583,400 @@ class StudentDocumentsViewSet(BaseStudentViewSet):
         ]
 
         response_data = []
-        error_message = ""
+        failed_uploads = {}
+
+        files_to_upload = {}
+        original_filenames = {}
+        for doc_type in document_types:
+            uploaded_file = validated_data.get(doc_type)
+            if uploaded_file:
+                bucket_folder_name = f"STUDENT/u{user.id}/{doc_type}"
+                # The storage backend renames the file object on save, keep what the student sent
+                original_filenames[doc_type] = uploaded_file.name
+                files_to_upload[doc_type] = (uploaded_file, build_file_name(uploaded_file, bucket_folder_name))
+
+        if not files_to_upload:
+            return response_data, "No files provided for upload!", failed_uploads
+
+        # Resubmitted files whose content is already stored keep their object instead of being uploaded again
+        content_hashes = {doc_type: get_content_hash(the_file) for doc_type, (the_file, _) in files_to_upload.items()}
+        stored_file_names = cls.get_stored_file_names(user, content_hashes)
+
+        # Upload to GCP
+        upload_results = {doc_type: (file_name, "") for doc_type, file_name in stored_file_names.items()}
+        if on_file_uploaded:
+            for doc_type, result in upload_results.items():
+                on_file_uploaded(doc_type, result)
+        upload_results.update(google_bucket_files_upload({
+            doc_type: upload for doc_type, upload in files_to_upload.items() if doc_type not in stored_file_names
+        }, on_uploaded=on_file_uploaded))
+
+        uploaded_documents = {}
+        for doc_type, (gcp_file_path, error_msg) in upload_results.items():
+            if not gcp_file_path:
+                failed_uploads[doc_type] = error_msg
+                continue
+
+            uploaded_documents[doc_type] = {
+                'original_filename': original_filenames[doc_type],
+                'uploaded_file_name': gcp_file_path,
+                'file_size': files_to_upload[doc_type][0].size,
+                'content_hash': content_hashes[doc_type],
+            }
 
+        errors = []
         try:
-            for doc_type in document_types:
-                uploaded_file = validated_data.get(doc_type)
-                if uploaded_file:
+            response_data = cls.save_student_documents(user, uploaded_documents)
+        except Exception as ex:
+            logger.error(f"Saving documents of student {user.id} failed: {ex}", exc_info=True)
+            response_data = []
+            errors.append(str(ex))
+            # Nothing references the objects this request put in the bucket, hand them to the purge queue
+            new_file_names = [document['uploaded_file_name'] for doc_type, document in uploaded_documents.items()
+                              if doc_type not in stored_file_names]
+            try:
+                enqueue_orphaned_objects(new_file_names, reason='failed_save')
+            except Exception as gc_ex:
+                logger.error(f"Could not queue {new_file_names} for purge: {gc_ex}", exc_info=True)
+
+        errors.extend(f"Failed to upload {doc_type}: {error_msg}" for doc_type, error_msg in failed_uploads.items())
+        error_message = "; ".join(errors)
+
+        return response_data, error_message, failed_uploads
 
-                    bucket_folder_name = f"STUDENT/u{user.id}/{doc_type}"
-                    file_name = build_file_name(uploaded_file, bucket_folder_name)
+    @classmethod
+    def get_stored_file_names(cls, user, content_hashes):
+        """
+        Bucket objects already holding this content, content_hashes maps document type -> SHA-256
+        Returns document type -> uploaded_file_name for the types whose current document has the same hash
+        """
+        documents = StudentDocument.objects.filter(
+            user=user,
+            document_type__in=list(content_hashes),
+            content_hash__in=set(content_hashes.values()),
+        ).values_list('document_type', 'content_hash', 'uploaded_file_name')
+
+        return {
+            document_type: uploaded_file_name
+            for document_type, content_hash, uploaded_file_name in documents
+            if content_hashes[document_type] == content_hash and uploaded_file_name
+        }
 
-                    # Upload to GCP
-                    gcp_file_path, error_msg = google_bucket_file_upload(uploaded_file, file_name)
+    @classmethod
+    def save_student_documents(cls, user, uploaded_documents):
+        """
+        Record files already stored in the bucket as the student's documents and complete the upload step
+        uploaded_documents maps document type -> original_filename, uploaded_file_name and file_size
+        """
+        documents = []
+        with transaction.atomic():
+            previous_files = {
+                document_type: (uploaded_file_name, thumbnail_file_name)
+                for document_type, uploaded_file_name, thumbnail_file_name in StudentDocument.objects
+                .select_for_update()
+                .filter(user=user, document_type__in=list(uploaded_documents))
+                .values_list('document_type', 'uploaded_file_name', 'thumbnail_file_name')
+            }
+            superseded = [
+                doc_type for doc_type, values in uploaded_documents.items()
+                if doc_type in previous_files and previous_files[doc_type][0] != values['uploaded_file_name']
+            ]
+            # Objects replaced by this upload are purged in the background
+            enqueue_orphaned_objects(
+                [file_name for doc_type in superseded for file_name in previous_files[doc_type]],
+                reason='superseded'
+            )
 
-                    if gcp_file_path:
-                        # Use update_or_create to handle existing documents
-                        document, created = StudentDocument.objects.update_or_create(
-                            user=user,
-                            document_type=doc_type,
-                            defaults={
-                                'original_filename': uploaded_file.name,
-                                'uploaded_file_name': gcp_file_path,
-                                'file_size': uploaded_file.size,
-                                'doc_type': 'STUDENT_DOCUMENTS',
-                                'related_resource_type': 'student'
-                            }
-                        )
-
-                        # If updating existing document, delete old file
-                        if not created and document.uploaded_file_name != gcp_file_path:
-                            # The old file path would be stored before update_or_create
-                            pass  # Already handled by update_or_create
-
-                        response_data.append(document)
-                    else:
-                        error_message = f"Failed to upload {doc_type}: {error_msg}"
-                        break
+            for doc_type, values in uploaded_documents.items():
+                defaults = {
+                    **values,
+                    'doc_type': 'STUDENT_DOCUMENTS',
+                    'related_resource_type': 'student'
+                }
+                if doc_type in superseded:
+                    defaults['thumbnail_file_name'] = None
+
+                # Use update_or_create to handle existing documents
+                document, created = StudentDocument.objects.update_or_create(
+                    user=user,
+                    document_type=doc_type,
+                    defaults=defaults
+                )
+                documents.append(document)
+
+            if len(documents) > 0:
+                # Auto-update onboarding progress
+                from django.utils import timezone
+                StudentOnboardingStep.objects.update_or_create(
+                    user=user,
+                    step='student_documents_upload',
+                    defaults={
+                        'is_completed': True,
+                        'completed_at': timezone.now(),
+                        'step_data': {'documents_uploaded': len(documents)}
+                    }
+                )
+                schedule_thumbnails(documents)
 
-            if len(response_data) == 0 and not error_message:
-                error_message = "No files provided for upload!"
+        return documents
 
-        except Exception as ex:
-            error_message = str(ex)
-
-        if len(response_data) > 0:
-            # Auto-update onboarding progress
-            from django.utils import timezone
-            StudentOnboardingStep.objects.update_or_create(
-                user=user,
-                step='student_documents_upload',
-                defaults={
-                    'is_completed': True,
-                    'completed_at': timezone.now(),
-                    'step_data': {'documents_uploaded': len(response_data)}
-                }
+
+class StudentDocumentUploadsViewSet(GenericViewSet):
+    """
+    Resumable chunked uploads for student documents
+    POST /student-document-uploads/ - Start an upload {document_type, filename, total_size}
+    GET /student-document-uploads/{id}/ - Upload state, received_bytes is where to resume from
+    PUT /student-document-uploads/{id}/ - Append a byte range, raw body with Content-Range: bytes {start}-{end}/{total}
+    POST /student-document-uploads/{id}/finalize/ - Assemble the parts and record the StudentDocument
+
+    Direct-to-bucket uploads, no document bytes pass through the workers
+    POST /student-document-uploads/signed/ - Signed PUT URL and upload_token {document_type, filename, total_size}
+    POST /student-document-uploads/signed/complete/ - Verify the uploaded object and record it {upload_token}
+    """
+    http_method_names = ['get', 'post', 'put']
+    authentication_classes = [JWTAuth]
+    permission_classes = [IsStudent]
+    queryset = StudentDocumentUpload.objects.all()
+    serializer_class = StudentDocumentUploadSessionSerializer
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return self.queryset.none()
+        return self.queryset.filter(user=self.request.user)
+
+    def get_locked_upload(self):
+        """The upload row locked for the rest of the transaction, so parallel PUTs to one upload are serialized"""
+        upload = self.get_object()
+        return StudentDocumentUpload.objects.select_for_update().get(pk=upload.pk)
+
+    def create(self, request, *args, **kwargs):
+        serializer = StudentDocumentUploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = StudentDocumentUpload.objects.create(
+            user=request.user,
+            document_type=serializer.validated_data['document_type'],
+            original_filename=serializer.validated_data['filename'],
+            total_size=serializer.validated_data['total_size'],
+        )
+        data = StudentDocumentUploadSessionSerializer(upload).data
+        data['chunk_max_size'] = settings.STUDENT_DOCUMENT_CHUNK_MAX_SIZE
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(StudentDocumentUploadSessionSerializer(self.get_object()).data)
+
+    def update(self, request, *args, **kwargs):
+        content_range = parse_content_range(request.headers.get('Content-Range'))
+        if content_range is None:
+            return Response({'error': 'Content-Range: bytes {start}-{end}/{total} header is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        start, end, total = content_range
+        length = end - start + 1
+        if length > settings.STUDENT_DOCUMENT_CHUNK_MAX_SIZE:
+            return Response({'error': f'Chunk exceeds {settings.STUDENT_DOCUMENT_CHUNK_MAX_SIZE} bytes'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = self.get_locked_upload()
+
+            if upload.status != StudentDocumentUpload.STATUS_IN_PROGRESS:
+                return Response({'error': 'Upload is already finalized'}, status=status.HTTP_409_CONFLICT)
+            if total != upload.total_size or end >= upload.total_size:
+                return Response({'error': f'Range does not fit an upload of {upload.total_size} bytes'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if start != upload.received_bytes:
+                # Chunks are appended in order, tell the client where to resume
+                return Response({'error': 'Unexpected range start', 'received_bytes': upload.received_bytes},
+                                status=status.HTTP_409_CONFLICT)
+
+            try:
+                part_name = store_upload_chunk(upload, request.stream, start, length)
+            except IncompleteChunkError as ex:
+                return Response({'error': str(ex), 'received_bytes': upload.received_bytes},
+                                status=status.HTTP_400_BAD_REQUEST)
+            except ValidationError as ex:
+                return Response({'error': ex.messages}, status=status.HTTP_400_BAD_REQUEST)
+
+            upload.parts.append({'offset': start, 'size': length, 'name': part_name})
+            upload.received_bytes = end + 1
+            upload.save(update_fields=['parts', 'received_bytes', 'updated_at'])
+
+        return Response(StudentDocumentUploadSessionSerializer(upload).data)
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.status == StudentDocumentUpload.STATUS_COMPLETED:
+            # Repeated finalize after a dropped response
+            return Response(StudentDocumentSerializer(upload.document).data)
+        if upload.received_bytes != upload.total_size:
+            return Response({'error': 'Upload is incomplete', 'received_bytes': upload.received_bytes},
+                            status=status.HTTP_409_CONFLICT)
+
+        # A complete upload accepts no more parts, so it is assembled and stored without holding the row lock
+        assembled_file = assemble_upload(upload)
+        try:
+            StudentDocumentUploadSerializer.document_validator(assembled_file)
+
+            content_hash = assembled_file.content_hash
+            stored_file_names = StudentDocumentsViewSet.get_stored_file_names(
+                request.user, {upload.document_type: content_hash}
             )
+            is_new_object = upload.document_type not in stored_file_names
+            if is_new_object:
+                bucket_folder_name = f"STUDENT/u{request.user.id}/{upload.document_type}"
+                gcp_file_path, error_msg = google_bucket_file_upload(
+                    assembled_file, build_file_name(assembled_file, bucket_folder_name)
+                )
+            else:
+                gcp_file_path, error_msg = stored_file_names[upload.document_type], ""
+        except ValidationError as ex:
+            return Response({'error': ex.messages}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            assembled_file.close()
+
+        if not gcp_file_path:
+            return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = self.get_locked_upload()
+            if upload.status == StudentDocumentUpload.STATUS_COMPLETED:
+                # A parallel finalize committed first, the object stored here is not needed
+                if is_new_object:
+                    enqueue_orphaned_objects([gcp_file_path], reason='duplicate_finalize', delay=timedelta(0))
+                return Response(StudentDocumentSerializer(upload.document).data)
+
+            document, = StudentDocumentsViewSet.save_student_documents(request.user, {
+                upload.document_type: {
+                    'original_filename': upload.original_filename,
+                    'uploaded_file_name': gcp_file_path,
+                    'file_size': upload.total_size,
+                    'content_hash': content_hash,
+                }
+            })
+
+            upload.status = StudentDocumentUpload.STATUS_COMPLETED
+            upload.document = document
+            upload.save(update_fields=['status', 'document', 'updated_at'])
+            enqueue_orphaned_objects([part['name'] for part in upload.parts], reason='upload_parts', delay=timedelta(0))
+
+        return Response(StudentDocumentSerializer(document).data)
+
+    @action(detail=False, methods=['post'], url_path='signed')
+    def signed(self, request, *args, **kwargs):
+        serializer = StudentDocumentUploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        signed_upload = issue_signed_upload(request.user, **serializer.validated_data)
+        # The local stand-in storage signs a path on this server
+        signed_upload['upload_url'] = request.build_absolute_uri(signed_upload['upload_url'])
+        return Response(signed_upload, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='signed/complete')
+    def signed_complete(self, request, *args, **kwargs):
+        serializer = StudentDocumentSignedUploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            claims = load_signed_upload(serializer.validated_data['upload_token'])
+        except signing.BadSignature:
+            return Response({'error': 'Invalid or expired upload token'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return response_data, error_message
+        if claims['user_id'] != request.user.id:
+            return Response({'error': 'Upload token belongs to another user'}, status=status.HTTP_403_FORBIDDEN)
 
+        error_msg = verify_signed_upload(claims)
+        if error_msg:
+            # The usual delay, a retried PUT to the same signed URL must not race the purge
+            enqueue_orphaned_objects([claims['file_name']], reason='rejected_upload')
+            return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+
+        document_type = claims['document_type']
+        content_hash = get_signed_upload_hash(claims)
+        stored_file_names = StudentDocumentsViewSet.get_stored_file_names(request.user, {document_type: content_hash})
+        uploaded_file_name = stored_file_names.get(document_type, claims['file_name'])
+
+        with transaction.atomic():
+            document, = StudentDocumentsViewSet.save_student_documents(request.user, {
+                document_type: {
+                    'original_filename': claims['original_filename'],
+                    'uploaded_file_name': uploaded_file_name,
+                    'file_size': claims['total_size'],
+                    'content_hash': content_hash,
+                }
+            })
+            if uploaded_file_name != claims['file_name']:
+                # The same content is already stored for this document, the new object is not needed
+                enqueue_orphaned_objects([claims['file_name']], reason='duplicate_upload')
+        return Response(StudentDocumentSerializer(document).data)
+
+
+
+class StudentDocumentIngestJobsViewSet(GenericViewSet):
+    """GET /student-document-ingest-jobs/{id}/ - Progress of a deferred document upload, per file"""
+    http_method_names = ['get']
+    authentication_classes = [JWTAuth]
+    permission_classes = [IsStudent]
+    queryset = StudentDocumentIngestJob.objects.all()
+    serializer_class = StudentDocumentIngestJobSerializer
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return self.queryset.none()
+        return self.queryset.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(StudentDocumentIngestJobSerializer(self.get_object()).data)
+
+class LocalDocumentUploadView(APIView):
+    """PUT /local-document-uploads/{token}/ - Stands in for the bucket behind LocalDocumentStorage signed URLs"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def put(self, request, token):
+        storage = get_document_storage()
+        if not isinstance(storage, LocalDocumentStorage):
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            claims = storage.verify_upload_token(token)
+        except signing.BadSignature:
+            return Response({'error': 'Invalid or expired upload URL'}, status=status.HTTP_403_FORBIDDEN)
+
+        # Like a V4 signed URL, the Content-Type header is part of what was signed
+        if request.content_type.split(';')[0].strip() != claims['content_type']:
+            return Response({'error': 'Content-Type does not match the signed upload'},
+                            status=status.HTTP_403_FORBIDDEN)
+        if request.stream is None:
+            return Response({'error': 'Empty upload'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Unauthenticated, so never take more than a document may be
+        try:
+            content_length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            content_length = 0
+        if not content_length:
+            return Response({'error': 'Content-Length header is required'}, status=status.HTTP_411_LENGTH_REQUIRED)
+        if content_length > settings.STUDENT_DOCUMENT_MAX_SIZE:
+            return Response({'error': f'Upload exceeds {settings.STUDENT_DOCUMENT_MAX_SIZE} bytes'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        with tempfile.TemporaryFile() as spool:
+            received = 0
+            while True:
+                data = request.stream.read(STREAM_READ_SIZE)
+                if not data:
+                    break
+                received += len(data)
+                if received > content_length:
+                    return Response({'error': 'Body is longer than Content-Length'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                spool.write(data)
+            spool.seek(0)
+            storage.save(claims['name'], File(spool))
+        return Response(status=status.HTTP_200_OK)
 
 class StudentUsersViewSet(ModelViewSet):
     """GET /student-users/ - Student list for admin - matches old backend StudentUserViewSet"""
@@ -493,6 +987,10 @@ class StudentUsersViewSet(ModelViewSet):
     search_fields = ['student_user__first_name', 'student_user__last_name', 'student_user__email']
     filterset_class = StudentUsersFilterSet
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    ordering_fields = [
+        'id', 'one_auth_uuid', 'first_name', 'last_name', 'email', 'date_of_birth', 'gender', 'nationality',
+        'is_active', 'is_approved', 'date_joined', 'onboarding_progress', 'last_onboarding_step',
+    ]
     ordering = ['-date_joined']
 
     def get_queryset(self):
@@ -500,7 +998,7 @@ class StudentUsersViewSet(ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return StudentUser.objects.none()
 
-        return StudentUser.objects.all()
+        return annotate_student_list(StudentUser.objects.all())
 
     def get_serializer_context(self):
         """Add profile image context like old backend"""
@@ -544,8 +1042,8 @@ class UserViewSet(ModelViewSet):  # Don't inherit from BaseStudentViewSet
         if getattr(self, 'swagger_fake_view', False):
             return StudentUser.objects.none()
         if is_any_admin(self.request):
-            return StudentUser.objects.all()
-        return StudentUser.objects.filter(id=self.request.user.id)
+            return get_student_profile_queryset()
+        return get_student_profile_queryset().filter(id=self.request.user.id)
 
     def get_serializer_class(self):
         """Return complete profile serializer"""
@@ -553,15 +1051,20 @@ class UserViewSet(ModelViewSet):  # Don't inherit from BaseStudentViewSet
 
     def list(self, request, *args, **kwargs):
         """GET /user/ - Get current user's own profile (Student only)"""
-        user = request.user
-        serializer = StudentCompleteProfileSerializer(user, context={'request': request})
-        return Response(serializer.data)
+        return Response(get_or_build_profile_snapshot(request.user.id))
 
     def retrieve(self, request, *args, **kwargs):
         """GET /user/{id}/ - Get specific user profile (Admin/PriyoPay only)"""
+        # Admins may read any student, so a materialized snapshot can be served without touching the DB
+        # Anything but a numeric id falls through to get_object, which answers 404
+        student_id = str(kwargs[self.lookup_field])
+        if is_any_admin(request) and student_id.isdigit():
+            snapshot = get_profile_snapshot(int(student_id))
+            if snapshot is not None:
+                return Response(snapshot)
+
         user = self.get_object()
-        serializer = StudentCompleteProfileSerializer(user, context={'request': request})
-        return Response(serializer.data)
+        return Response(build_profile_snapshot(user))
 
     @action(detail=False, methods=['patch'])
     def update_by_uuid(self, request, *args, **kwargs):
@@ -0,0 +1,173 @@
+import time
+import threading
+
+
+class UpstreamUnavailable(Exception):
+    """A call was refused without reaching the upstream, retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class BulkheadFullError(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and refuses calls for reset_timeout seconds
+    Then lets a single trial call through (half-open), which closes it on success or reopens it on failure
+    before_call() returns an admission ticket that record_success/record_failure take back, results of calls
+    admitted before the breaker last opened are ignored, so a slow straggler cannot close it or end a trial
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        # Bumped every time the breaker opens
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may go through, returns the call's (generation, is_trial) ticket"""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError("Circuit open", retry_after=remaining)
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self.trial_in_flight:
+                    raise CircuitOpenError("Circuit half-open, trial call in flight", retry_after=self.reset_timeout)
+                self.trial_in_flight = True
+                return self.generation, True
+            return self.generation, False
+
+    def record_success(self, ticket):
+        generation, is_trial = ticket
+        with self._lock:
+            if generation != self.generation:
+                return
+            if is_trial:
+                self.state = self.CLOSED
+                self.trial_in_flight = False
+            if self.state == self.CLOSED:
+                self.failures = 0
+
+    def record_failure(self, ticket):
+        generation, is_trial = ticket
+        with self._lock:
+            if generation != self.generation:
+                return
+            if is_trial:
+                self.trial_in_flight = False
+                self._open()
+            elif self.state == self.CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.generation += 1
+
+
+class Bulkhead:
+    """Cap on calls in flight, a call waits at most max_wait seconds for a slot before BulkheadFullError"""
+
+    def __init__(self, max_calls, max_wait):
+        self.max_calls = max_calls
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_calls)
+
+    def acquire(self):
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            raise BulkheadFullError(f"More than {self.max_calls} calls in flight", retry_after=1)
+
+    def release(self):
+        self._semaphore.release()
+
+
+class Guard:
+    """Circuit breaker and bulkhead for one upstream operation, with counters for the status endpoint"""
+
+    def __init__(self, name, failure_threshold, reset_timeout, max_calls, max_wait):
+        self.name = name
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.bulkhead = Bulkhead(max_calls, max_wait)
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.circuit_rejections = 0
+        self.bulkhead_rejections = 0
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, is_failure=None, **kwargs):
+        """
+        Run fn inside the breaker and the bulkhead, raises UpstreamUnavailable if refused
+        Exceptions count as failures, and so do results is_failure flags
+        """
+        try:
+            self.bulkhead.acquire()
+        except BulkheadFullError:
+            self._count('bulkhead_rejections')
+            raise
+
+        try:
+            try:
+                ticket = self.breaker.before_call()
+            except CircuitOpenError:
+                self._count('circuit_rejections')
+                raise
+
+            self._count('calls', 'in_flight')
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                self.breaker.record_failure(ticket)
+                self._count('failures')
+                raise
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+        finally:
+            self.bulkhead.release()
+
+        if is_failure and is_failure(result):
+            self.breaker.record_failure(ticket)
+            self._count('failures')
+        else:
+            self.breaker.record_success(ticket)
+        return result
+
+    def _count(self, *fields):
+        with self._lock:
+            for field in fields:
+                setattr(self, field, getattr(self, field) + 1)
+
+    def get_status(self):
+        return {
+            'name': self.name,
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.bulkhead.max_calls,
+            'calls': self.calls,
+            'failures': self.failures,
+            'circuit_rejections': self.circuit_rejections,
+            'bulkhead_rejections': self.bulkhead_rejections,
+        }
@@ -0,0 +1,102 @@
+import random
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class JitterRetry(Retry):
+    """Retry with full jitter on the backoff, so workers retrying the same upstream do not arrive in lockstep"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+
+class TimeoutSession(requests.Session):
+    """Session that applies a default (connect, read) timeout to every request that does not pass its own"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+
+class OutboundHttpClient:
+    """
+    Keep-alive session for one upstream service
+    Connections are pooled per host, every call gets connect/read timeouts unless it passes its own,
+    idempotent methods are retried on connection errors and 502/503/504 with jittered backoff
+    """
+
+    def __init__(self, name, connect_timeout, read_timeout, max_retries, backoff_factor, pool_maxsize):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = JitterRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+        # The timeout lives on the session, so code holding the bare session (attach_http_client) still gets it
+        self.session = TimeoutSession(self.timeout)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name):
+    """The process-wide client for an upstream (priyopay, auth, supabase), created on first use"""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = OutboundHttpClient(
+                    name,
+                    connect_timeout=settings.OUTBOUND_HTTP_CONNECT_TIMEOUT,
+                    read_timeout=settings.OUTBOUND_HTTP_READ_TIMEOUT,
+                    max_retries=settings.OUTBOUND_HTTP_MAX_RETRIES,
+                    backoff_factor=settings.OUTBOUND_HTTP_BACKOFF_FACTOR,
+                    pool_maxsize=settings.OUTBOUND_HTTP_POOL_MAXSIZE,
+                )
+    return client
+
+
+def attach_http_client(api_client, name):
+    """
+    Route an api_clients client through the pooled session of the named upstream
+    Those clients keep their requests.Session on .session, a client without one is returned as is
+    with a warning, it still works but goes out unpooled and without the default timeouts
+    """
+    if not hasattr(api_client, 'session'):
+        logger.warning(f"{type(api_client).__name__} has no session to route through the '{name}' HTTP client, "
+                       f"its calls are not pooled")
+        return api_client
+    api_client.session = get_http_client(name).session
+    return api_client